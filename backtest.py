@@ -0,0 +1,229 @@
+"""Backtest of the TradingBot entry price gated copy rules on historical leader fills and mid prices
+
+Replays TradingBot.update_positions on a time grid of --step seconds, the polling interval of the
+bot: a leader position is copied only at a price below the leader's entry (above for shorts),
+size-ups at unfavourable prices are skipped, positions the leader closed are closed and trades
+below TRADE_LIMIT are not sent. Targets are sized against a constant leader account value.
+
+Decisions depend on our own position, so the time steps run in order, but every step is a handful
+of NumPy operations over all coins and all parameter combinations at once, which is what makes
+sweeping LEVERAGE x TRADE_LIMIT grids over months of data cheap.
+
+Inputs are leader fills (a userFills/userFillsByTime JSON list, or CSV with time,coin,px,sz,side)
+and mid prices (CSV with time,coin,mid, times in ms), or a journal recorded by position_bot.
+
+Usage: python backtest.py --fills fills.json --mids mids.csv --leader-value 1000000 --capital 10000 \\
+           --leverage 1 3 5 --trade-limit 10 50 [--step 60] [--gate on off]
+Needs numpy: poetry install --with backtest
+"""
+import argparse
+import csv
+import json
+import time
+from collections import defaultdict
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("backtest.py needs numpy, install it with: poetry install --with backtest") from None
+import journal
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+def load_fills(path):
+    """Leader fills as dicts with time (ms), coin, px, sz, side ('B'/'A') and optional startPosition"""
+    if path.endswith(".json"):
+        with open(path) as f:
+            fills = json.load(f)
+    else:
+        with open(path, newline="") as f:
+            fills = list(csv.DictReader(f))
+    return [
+        {
+            "time": int(fill["time"]), "coin": fill["coin"], "px": float(fill["px"]), "sz": float(fill["sz"]),
+            "side": fill["side"], "startPosition": float(fill.get("startPosition") or 0),
+        }
+        for fill in fills
+    ]
+
+def load_mids(path):
+    """Mid prices as (time ms, coin, mid) rows"""
+    with open(path, newline="") as f:
+        return [(int(row["time"]), row["coin"], float(row["mid"])) for row in csv.DictReader(f)]
+
+def load_journal(path):
+    """Leader fills, mid prices and szDecimals from a position_bot journal, timed by the journal's clock"""
+    fills, mids, sz_decimals = [], [], {}
+    for monotonic_ns, channel, message in journal.read(path, "position_bot"):
+        time_ms = monotonic_ns // 1_000_000
+        if channel == "userFills" and not message["data"].get("isSnapshot"):
+            for fill in message["data"]["fills"]:
+                fills.append({
+                    "time": time_ms, "coin": fill["coin"], "px": float(fill["px"]), "sz": float(fill["sz"]),
+                    "side": fill["side"], "startPosition": float(fill.get("startPosition") or 0),
+                })
+        elif channel == "allMids":
+            mids.extend((time_ms, coin, float(mid)) for coin, mid in message["data"]["mids"].items())
+        elif channel == "meta":
+            sz_decimals = {asset["name"]: asset["szDecimals"] for asset in message["universe"]}
+    return fills, mids, sz_decimals
+
+class Market:
+    """Mid prices and the leader's position and entry price of every coin, as of each grid time"""
+
+    def __init__(self, fills, mids, step_ms, sz_decimals=None):
+        fills = sorted(fills, key=lambda fill: fill["time"])
+        self.coins = sorted({fill["coin"] for fill in fills})
+        column = {coin: i for i, coin in enumerate(self.coins)}
+        mid_rows = [row for row in mids if row[1] in column]
+        start = min([fill["time"] for fill in fills[:1]] + [row[0] for row in mid_rows[:1]])
+        end = max(fills[-1]["time"], max(row[0] for row in mid_rows))
+        self.times = np.arange(start, end + step_ms, step_ms)
+        self.step_ms = step_ms
+        shape = (len(self.times), len(self.coins))
+        self.mid = np.full(shape, np.nan)
+        self.leader_szi = np.zeros(shape)
+        self.leader_entry = np.full(shape, np.nan)
+        self.sz_decimals = np.array([(sz_decimals or {}).get(coin, 4) for coin in self.coins])
+
+        # Mids as of each grid time, NaN before a coin's first price
+        by_coin = defaultdict(list)
+        for time_ms, coin, mid in sorted(mid_rows):
+            by_coin[coin].append((time_ms, mid))
+        for coin, rows in by_coin.items():
+            times, values = np.array(rows).T
+            index = np.searchsorted(times, self.times, side="right") - 1
+            self.mid[:, column[coin]] = np.where(index >= 0, values[np.maximum(index, 0)], np.nan)
+
+        # The leader's average entry price is path dependent, walk the fills once per coin
+        by_coin = defaultdict(list)
+        for fill in fills:
+            by_coin[fill["coin"]].append(fill)
+        for coin, coin_fills in by_coin.items():
+            position = coin_fills[0]["startPosition"]
+            entry = coin_fills[0]["px"] if position else np.nan
+            times, positions, entries = [], [], []
+            for fill in coin_fills:
+                delta = fill["sz"] if fill["side"] == "B" else -fill["sz"]
+                new_position = round(position + delta, 8)
+                if new_position == 0:
+                    entry = np.nan
+                elif position == 0 or np.sign(new_position) != np.sign(position):
+                    entry = fill["px"]
+                elif abs(new_position) > abs(position):
+                    entry = (entry * abs(position) + fill["px"] * abs(delta)) / abs(new_position)
+                position = new_position
+                times.append(fill["time"])
+                positions.append(position)
+                entries.append(entry)
+            index = np.searchsorted(np.array(times), self.times, side="right") - 1
+            before = index < 0
+            index = np.maximum(index, 0)
+            start_position = coin_fills[0]["startPosition"]
+            self.leader_szi[:, column[coin]] = np.where(before, start_position, np.array(positions)[index])
+            self.leader_entry[:, column[coin]] = np.where(
+                before, coin_fills[0]["px"] if start_position else np.nan, np.array(entries)[index]
+            )
+
+def run(market, leverage, trade_limit, gate, capital, leader_value, fee=0.00045, slippage=0.0005):
+    """Simulate every (leverage, trade_limit, gate) combination, arrays of equal length, at once
+
+    Returns per combination the PnL, the PnL of an ungated copy always at its target, the annualized
+    tracking error of the strategy's returns against that copy and the number of trades.
+    """
+    leverage = np.asarray(leverage, dtype=float)[:, None]
+    trade_limit = np.asarray(trade_limit, dtype=float)[:, None]
+    gate = np.asarray(gate, dtype=bool)[:, None]
+    combos, coins = len(leverage), len(market.coins)
+    scale = 10.0 ** market.sz_decimals
+
+    # Everything that only depends on the leader and the prices is computed for all steps up front
+    marked = np.nan_to_num(market.mid)
+    abs_szi = np.abs(market.leader_szi)
+    sign = np.sign(market.leader_szi)
+    in_copy = market.leader_szi != 0
+    with np.errstate(invalid="ignore"):
+        at_or_below_entry = market.mid <= market.leader_entry
+        at_or_above_entry = market.mid >= market.leader_entry
+        favorable_open = ((sign > 0) & (market.mid < market.leader_entry)) | ((sign < 0) & (market.mid > market.leader_entry))
+
+    position = np.zeros((combos, coins))
+    cash = np.full(combos, float(capital))
+    trades = np.zeros(combos, dtype=int)
+    equity = np.empty((len(market.times), combos))
+
+    for t in range(len(market.times)):
+        price = marked[t]
+        my_value = (cash + position @ price) * leverage[:, 0]
+
+        # TradingBot.update_positions, with the price cancelling out of the target size
+        target = abs_szi[t] * (my_value / leader_value)[:, None]
+        held = position != 0
+        opening = in_copy[t] & ~held & (target * price > trade_limit) & (favorable_open[t] | ~gate)
+        diff = sign[t] * target - position
+        size_up = target > np.abs(position)
+        favorable_adjust = ((diff > 0) & at_or_below_entry[t]) | ((diff < 0) & at_or_above_entry[t])
+        adjusting = in_copy[t] & held & (np.abs(diff * price) > trade_limit) & (~size_up | favorable_adjust | ~gate)
+        trade = np.where(opening, sign[t] * target, 0.0) + np.where(adjusting, diff, 0.0)
+        trade -= np.where(~in_copy[t] & held, position, 0.0)
+
+        # execute_trade rounds to szDecimals and skips trades below TRADE_LIMIT
+        trade = np.round(trade * scale) / scale
+        trade = np.where(np.abs(trade) * price >= trade_limit, trade, 0.0)
+        cash -= trade @ price + np.abs(trade) @ price * (slippage + fee)
+        position += trade
+        trades += np.count_nonzero(trade, axis=1)
+        equity[t] = cash + position @ price
+
+    # An ungated copy at its target every step, sized on starting capital
+    ideal_position = market.leader_szi[:-1] * (capital / leader_value)
+    price_change = np.diff(marked, axis=0)
+    ideal_step_pnl = (ideal_position * price_change).sum(axis=1)[:, None] * leverage[:, 0]
+    step_pnl = np.diff(equity, axis=0)
+    steps_per_year = SECONDS_PER_YEAR * 1000 / market.step_ms
+    tracking_error = ((step_pnl - ideal_step_pnl) / capital).std(axis=0) * np.sqrt(steps_per_year)
+
+    return {
+        "pnl": equity[-1] - capital,
+        "ideal_pnl": ideal_step_pnl.sum(axis=0),
+        "tracking_error": tracking_error,
+        "trades": trades,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fills", help="leader fills, JSON (userFills format) or CSV with time,coin,px,sz,side")
+    parser.add_argument("--mids", help="CSV with time,coin,mid")
+    parser.add_argument("--journal", help="position_bot journal to take fills and mids from instead")
+    parser.add_argument("--leader-value", type=float, required=True, help="leader account value targets are sized against")
+    parser.add_argument("--capital", type=float, default=10000)
+    parser.add_argument("--leverage", type=float, nargs="+", default=[5])
+    parser.add_argument("--trade-limit", type=float, nargs="+", default=[10])
+    parser.add_argument("--gate", choices=["on", "off"], nargs="+", default=["on"], help="entry price gating")
+    parser.add_argument("--step", type=float, default=5, help="seconds between decisions, the bot's SLEEP_INTERVAL")
+    parser.add_argument("--fee", type=float, default=0.00045, help="taker fee rate")
+    parser.add_argument("--slippage", type=float, default=0.0005, help="fill price offset from the mid")
+    args = parser.parse_args()
+
+    if args.journal:
+        fills, mids, sz_decimals = load_journal(args.journal)
+    else:
+        fills, mids, sz_decimals = load_fills(args.fills), load_mids(args.mids), None
+    market = Market(fills, mids, int(args.step * 1000), sz_decimals)
+
+    grid = [(leverage, limit, gate) for leverage in args.leverage for limit in args.trade_limit for gate in args.gate]
+    leverage, trade_limit, gate = zip(*grid)
+    start = time.perf_counter()
+    results = run(market, leverage, trade_limit, [g == "on" for g in gate], args.capital, args.leader_value, args.fee, args.slippage)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(fills)} fills, {len(market.coins)} coins, {len(market.times)} steps of {args.step}s, "
+          f"{len(grid)} combinations in {elapsed:.2f}s")
+    print(f"{'leverage':>8} {'limit':>7} {'gate':>5} {'pnl':>12} {'return':>8} {'ideal pnl':>12} {'track err':>10} {'trades':>7}")
+    for i, (lev, limit, gated) in enumerate(grid):
+        print(
+            f"{lev:8g} {limit:7g} {gated:>5} {results['pnl'][i]:12.2f} {results['pnl'][i] / args.capital:8.2%} "
+            f"{results['ideal_pnl'][i]:12.2f} {results['tracking_error'][i]:10.2%} {results['trades'][i]:7d}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""End-to-end copy throughput and latency of a bot against the local mock server
+
+Starts benchmarks/mock_server.py and the bot as subprocesses, then drives the leader account at
+increasing event rates: order opens and cancels for order_bot, position changes for position_bot
+(run in ws mode). For every rate it reports the copies per second the bot sustained, the p50/p99
+copy latency measured by the mock (leader event to the bot's order, cancel or trade reaching
+/exchange) and the bot's CPU time per copied event, read from /proc. Pending counts leader events
+never copied, e.g. an open and cancel of the same order coalesced before the bot acted on it.
+
+Usage: python -m benchmarks.bench_copy_pipeline [--bot order_bot] [--rates 10 50 100 200] [--duration 10] [--latency-ms 20]
+"""
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import eth_account
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cpu_seconds(pid):
+    """User + system CPU time of a process, None where /proc is not available"""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except OSError:
+        return None
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else float("nan")
+
+
+class OrderEvents:
+    """Leader order opens until the book holds book_size orders, then random opens and cancels"""
+
+    def __init__(self, mids, book_size, rng):
+        self.mids = mids
+        self.book_size = book_size
+        self.rng = rng
+        self.book = set()
+
+    def next(self):
+        if len(self.book) >= self.book_size or (self.book and self.rng.random() < 0.5 and len(self.book) > self.book_size // 2):
+            coin, side, px = self.book.pop()
+            return {"type": "cancel", "coin": coin, "side": side, "px": px}
+        while True:
+            coin = self.rng.choice(list(self.mids))
+            side = self.rng.choice("BA")
+            factor = self.rng.uniform(0.9, 0.99) if side == "B" else self.rng.uniform(1.01, 1.1)
+            px = round(self.mids[coin] * factor, 2)
+            if (coin, side, px) not in self.book:
+                self.book.add((coin, side, px))
+                return {"type": "open", "coin": coin, "side": side, "px": px, "sz": round(100 / px, 2)}
+
+
+class PositionEvents:
+    """Leader long positions toggling between one and two units, entered above the mid so copies are not gated"""
+
+    def __init__(self, mids, rng):
+        self.mids = mids
+        self.rng = rng
+        self.sizes = {}
+
+    def next(self):
+        coin = self.rng.choice(list(self.mids))
+        unit = round(200 / self.mids[coin], 2)
+        szi = unit if self.sizes.get(coin) == 2 * unit else 2 * unit
+        self.sizes[coin] = szi
+        return {"type": "position", "coin": coin, "szi": szi, "entryPx": round(self.mids[coin] * 1.01, 2)}
+
+
+def wait_until(condition, timeout, what):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Timed out waiting for {what}")
+
+
+def drive(session, control_url, events, rate, duration):
+    """Send leader events at rate per second, batched every 10ms"""
+    start = time.monotonic()
+    sent = 0
+    while (elapsed := time.monotonic() - start) < duration:
+        due = int(rate * elapsed) - sent
+        if due > 0:
+            session.post(f"{control_url}/events", json={"events": [events.next() for _ in range(due)]})
+            sent += due
+        time.sleep(0.01)
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bot", choices=["order_bot", "position_bot"], default="order_bot")
+    parser.add_argument("--rates", type=float, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--duration", type=float, default=10, help="seconds each rate is driven for")
+    parser.add_argument("--drain", type=float, default=10, help="max seconds to wait for outstanding copies")
+    parser.add_argument("--book-size", type=int, default=100, help="leader open orders kept by the order_bot load")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--coins", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--ws-latency-ms", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if os.path.exists(os.path.join(ROOT, ".env")):
+        # The bots load .env with override=True, its keys and API URL would win over the mock settings below
+        sys.exit("Move .env out of the repository root first, it would point the bot at the real API")
+
+    leader = eth_account.Account.create().address
+    trader = eth_account.Account.create()
+    api_url = f"http://127.0.0.1:{args.port}"
+    control_url = f"{api_url}/control"
+    session = requests.Session()
+
+    mock = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.mock_server", "--leader", leader, "--trading", trader.address,
+        "--port", str(args.port), "--coins", str(args.coins),
+        "--latency-ms", str(args.latency_ms), "--ws-latency-ms", str(args.ws_latency_ms),
+    ], cwd=ROOT)
+    bot = None
+    try:
+        wait_until(lambda: session.get(f"{control_url}/stats").ok, 10, "mock server")
+        env = {
+            **os.environ,
+            "HYPERLIQUID_API_URL": api_url,
+            "PRIVATE_KEY_API": trader.key.hex(),
+            "ACCOUNT_TO_COPY": leader,
+            "TRADING_ADDRESS": trader.address,
+            "ACCOUNT_ADDRESS": "",
+            "VAULT_ADDRESS": "",
+            "LEVERAGE": "1",
+            "SENTRY_DSN": "",
+            "POSITION_BOT_MODE": "ws",
+            "STATE_DIR": os.path.join(tempfile.gettempdir(), "bench_state"),
+            # The mock does not limit requests, the live budget would cap the throughput being measured
+            "RATE_LIMIT_WEIGHT_PER_MINUTE": "1e9",
+            "RATE_LIMIT_BURST": "1e9",
+        }
+        log_path = os.path.join(tempfile.gettempdir(), f"bench_{args.bot}.log")
+        with open(log_path, "w") as log:
+            bot = subprocess.Popen([sys.executable, f"{args.bot}.py"], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        subscription = ("orderUpdates", 2) if args.bot == "order_bot" else ("webData2", 1)
+        wait_until(
+            lambda: session.get(f"{control_url}/stats").json()["subscriptions"].get(subscription[0], 0) >= subscription[1],
+            30, f"{args.bot} to subscribe (see {log_path})"
+        )
+
+        mids = session.get(f"{control_url}/stats").json()["mids"]
+        rng = random.Random(args.seed)
+        events = OrderEvents(mids, args.book_size, rng) if args.bot == "order_bot" else PositionEvents(mids, rng)
+        print(f"{args.bot}: {args.latency_ms}ms HTTP and {args.ws_latency_ms}ms websocket latency, {args.duration}s per rate")
+        print(f"{'rate/s':>8} {'sent':>7} {'copied':>7} {'copies/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'cpu ms/ev':>10} {'pending':>8}")
+        for rate in args.rates:
+            session.post(f"{control_url}/reset")
+            cpu_start = cpu_seconds(bot.pid)
+            sent = drive(session, control_url, events, rate, args.duration)
+            try:
+                wait_until(lambda: session.get(f"{control_url}/stats").json()["pending"] == 0, args.drain, "copies")
+            except RuntimeError:
+                pass
+            stats = session.get(f"{control_url}/stats").json()
+            cpu_end = cpu_seconds(bot.pid)
+            latencies = stats["latencies_ms"]
+            copies_per_s = stats["copied"] / stats["window_s"] if stats["window_s"] > 0 else 0
+            cpu_per_event = (
+                f"{(cpu_end - cpu_start) * 1000 / stats['copied']:10.2f}" if cpu_start is not None and stats["copied"] else f"{'n/a':>10}"
+            )
+            print(
+                f"{rate:8.0f} {sent:7d} {stats['copied']:7d} {copies_per_s:9.1f} {percentile(latencies, 0.5):8.1f} "
+                f"{percentile(latencies, 0.99):8.1f} {cpu_per_event} {stats['pending']:8d}"
+            )
+            if bot.poll() is not None:
+                print(f"{args.bot} exited, see {log_path}")
+                break
+    finally:
+        if bot is not None and bot.poll() is None:
+            bot.send_signal(signal.SIGINT)
+            try:
+                bot.wait(15)
+            except subprocess.TimeoutExpired:
+                bot.kill()
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Order submission throughput: blocking Exchange calls on the event loop vs. AsyncExchange
+
+Simulates an exchange action as a real EIP-712 signature followed by a sleep standing in for
+the HTTP round trip, then submits independent orders the way OrderBot coroutines do while a
+ticker task measures how long the event loop is stalled.
+
+Usage: python -m benchmarks.bench_order_submission [--orders 60] [--rtt-ms 150] [--concurrency 1 4 8]
+"""
+import argparse
+import asyncio
+import time
+import eth_account
+import requests
+from hyperliquid.utils.signing import order_request_to_order_wire, order_wires_to_order_action, sign_l1_action
+from exchange_client import AsyncExchange, unique_timestamp_ms
+from rate_limiter import RateLimiter
+
+
+class SimulatedExchange:
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.wallet = eth_account.Account.create()
+        self.session = requests.Session()
+
+    def order(self, coin, is_buy, sz, limit_px, order_type, reduce_only=False):
+        wire = order_request_to_order_wire(
+            {"coin": coin, "is_buy": is_buy, "sz": sz, "limit_px": limit_px, "order_type": order_type, "reduce_only": reduce_only},
+            0
+        )
+        sign_l1_action(self.wallet, order_wires_to_order_action([wire]), None, unique_timestamp_ms(), True)
+        return self.post("/exchange")
+
+    def post(self, url_path, payload=None):
+        time.sleep(self.rtt)
+        return {"status": "ok"}
+
+
+async def measure(submit, orders):
+    lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal lag
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lag = max(lag, time.perf_counter() - start - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*[submit(i) for i in range(orders)])
+    elapsed = time.perf_counter() - start
+    done = True
+    await tick
+    return elapsed, lag
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=60)
+    parser.add_argument("--rtt-ms", type=float, default=150)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+    exchange = SimulatedExchange(args.rtt_ms / 1000)
+    order_args = ("BTC", True, 0.001, 100000.0, {"limit": {"tif": "Gtc"}})
+
+    async def blocking_submit(i):
+        exchange.order(*order_args)
+
+    elapsed, lag = await measure(blocking_submit, args.orders)
+    print(f"{'blocking':>14}: {args.orders / elapsed:7.1f} orders/s, {elapsed:6.2f}s total, max loop stall {lag * 1000:7.1f}ms")
+
+    for concurrency in args.concurrency:
+        # Unlimited budget, this measures the executor rather than the rate limit
+        client = AsyncExchange(exchange, max_workers=concurrency, rate_limiter=RateLimiter(weight_per_minute=1e9, burst=1e9))
+
+        async def async_submit(i):
+            await client.call("order", *order_args)
+
+        elapsed, lag = await measure(async_submit, args.orders)
+        client.shutdown()
+        print(f"{f'executor x{concurrency}':>14}: {args.orders / elapsed:7.1f} orders/s, {elapsed:6.2f}s total, max loop stall {lag * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,451 @@
+"""Local stand-in for the Hyperliquid API, to run the bots without mainnet funds
+
+Serves /info (meta, spotMeta, clearinghouseState, openOrders, allMids), /exchange (order, cancel,
+batchModify, scheduleCancel, which cancels the trading account's orders when due) and the /ws
+websocket (allMids, orderUpdates, userFills, webData2) on one port, waiting --latency-ms before
+every HTTP response and --ws-latency-ms before every pushed message. Signatures are not checked and every exchange action is applied to the trading account.
+
+The leader account is driven over POST /control/events, and the server measures copy latency as
+the time from a leader event to the trading account's matching order, cancel or trade reaching
+/exchange. GET /control/stats reports it, POST /control/reset starts a new measurement window,
+POST /control/meta replaces the served universe, POST /control/account sets an account's value and
+POST /control/disconnect closes every websocket, or with {"silent": true} stops answering on them
+while keeping them open.
+
+Usage: python -m benchmarks.mock_server --leader 0x... --trading 0x... [--port 8900] [--latency-ms 20]
+Then run a bot with HYPERLIQUID_API_URL=http://127.0.0.1:8900
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import time
+from collections import Counter
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+COIN_NAMES = ["BTC", "ETH", "SOL", "HYPE", "DOGE", "XRP", "AVAX", "LINK", "ARB", "OP"]
+
+
+def encode_frame(opcode, payload):
+    header = bytes([0x80 | opcode])
+    if len(payload) < 126:
+        header += bytes([len(payload)])
+    elif len(payload) < 1 << 16:
+        header += bytes([126]) + struct.pack("!H", len(payload))
+    else:
+        header += bytes([127]) + struct.pack("!Q", len(payload))
+    return header + payload
+
+
+async def read_frame(reader):
+    head = await reader.readexactly(2)
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if head[1] & 0x80 else None
+    data = await reader.readexactly(length)
+    if mask:
+        data = bytes(byte ^ mask[i % 4] for i, byte in enumerate(data))
+    return head[0] & 0x0F, data
+
+
+def price_key(coin, side, px):
+    return (coin, side, round(float(px), 8))
+
+
+class WsClient:
+    """One websocket connection, pushing messages in order after the configured latency"""
+
+    def __init__(self, writer, latency):
+        self.writer = writer
+        self.latency = latency
+        self.subscriptions = []
+        self.silent = False  # a half-open connection, nothing is sent anymore
+        self.outbox = asyncio.Queue()
+        self.task = asyncio.create_task(self.flush())
+
+    def send(self, msg, opcode=0x1):
+        if self.silent:
+            return
+        payload = msg if isinstance(msg, bytes) else json.dumps(msg).encode()
+        self.outbox.put_nowait((time.monotonic() + self.latency, encode_frame(opcode, payload)))
+
+    async def flush(self):
+        while True:
+            due, frame = await self.outbox.get()
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.writer.write(frame)
+            await self.writer.drain()
+
+    def subscribed(self, kind, user):
+        return any(
+            sub["type"] == kind and (user is None or sub.get("user", "").lower() == user)
+            for sub in self.subscriptions
+        )
+
+
+class Account:
+    def __init__(self, value):
+        self.value = value
+        self.orders = {}  # oid -> order in the openOrders/orderUpdates format
+        self.positions = {}  # coin -> {"szi": float, "entryPx": float}
+
+    def order_at(self, key):
+        return next((order for order in self.orders.values() if price_key(order["coin"], order["side"], order["limitPx"]) == key), None)
+
+
+class MockHyperliquid:
+    def __init__(self, leader, trading, coins, account_value, latency, ws_latency):
+        self.leader = leader.lower()
+        self.trading = trading.lower()
+        self.latency = latency
+        self.ws_latency = ws_latency
+        names = [COIN_NAMES[i] if i < len(COIN_NAMES) else f"COIN{i}" for i in range(coins)]
+        self.universe = [{"name": name, "szDecimals": 2, "maxLeverage": 50} for name in names]
+        self.mids = {name: 100.0 + i for i, name in enumerate(names)}
+        self.accounts = {self.leader: Account(account_value), self.trading: Account(account_value)}
+        self.clients = set()
+        self.next_oid = 1
+        self.scheduled_cancel = None  # TimerHandle of the trading account's scheduleCancel
+        self.reset()
+
+    def reset(self):
+        self.pending = {}  # (kind, key) -> monotonic time of the leader event still waiting for its copy
+        self.latencies = []
+        self.leader_events = 0
+        self.exchange_actions = Counter()
+        self.window_start = time.monotonic()
+        self.last_copy = self.window_start
+
+    def account(self, user):
+        return self.accounts.setdefault(user.lower(), Account(0))
+
+    def copied(self, kind, key):
+        started = self.pending.pop((kind, key), None)
+        if started is not None:
+            self.last_copy = time.monotonic()
+            self.latencies.append((self.last_copy - started) * 1000)
+
+    # Websocket
+
+    def publish(self, kind, user, msg):
+        for client in list(self.clients):
+            if client.subscribed(kind, user):
+                client.send(msg)
+
+    def publish_order(self, user, order, status):
+        now = int(time.time() * 1000)
+        self.publish("orderUpdates", user, {
+            "channel": "orderUpdates",
+            "data": [{"order": order, "status": status, "statusTimestamp": now}],
+        })
+
+    def publish_state(self, user, fills=()):
+        if fills:
+            self.publish("userFills", user, {"channel": "userFills", "data": {"user": user, "fills": list(fills)}})
+        self.publish("webData2", user, {
+            "channel": "webData2", "data": {"user": user, "clearinghouseState": self.clearinghouse_state(user)}
+        })
+
+    def handle_ws_message(self, client, msg):
+        if msg.get("method") == "ping":
+            client.send({"channel": "pong"})
+        elif msg.get("method") == "subscribe":
+            subscription = msg["subscription"]
+            client.subscriptions.append(subscription)
+            client.send({"channel": "subscriptionResponse", "data": msg})
+            user = subscription.get("user", "").lower()
+            if subscription["type"] == "allMids":
+                client.send({"channel": "allMids", "data": {"mids": self.all_mids()}})
+            elif subscription["type"] == "userFills":
+                client.send({"channel": "userFills", "data": {"isSnapshot": True, "user": user, "fills": []}})
+            elif subscription["type"] == "webData2":
+                client.send({"channel": "webData2", "data": {"user": user, "clearinghouseState": self.clearinghouse_state(user)}})
+
+    async def serve_websocket(self, reader, writer, headers):
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WS_GUID).encode()).digest()).decode()
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        client = WsClient(writer, self.ws_latency)
+        self.clients.add(client)
+        try:
+            while True:
+                opcode, data = await read_frame(reader)
+                if opcode == 0x8:
+                    # Echo the close frame like the exchange does, the client waits for it before hanging up
+                    writer.write(encode_frame(0x8, data))
+                    await writer.drain()
+                    break
+                if opcode == 0x9:
+                    client.send(data, opcode=0xA)
+                elif opcode == 0x1:
+                    self.handle_ws_message(client, json.loads(data))
+        finally:
+            self.clients.discard(client)
+            client.task.cancel()
+
+    # /info
+
+    def all_mids(self):
+        return {coin: str(mid) for coin, mid in self.mids.items()}
+
+    def clearinghouse_state(self, user):
+        account = self.account(user)
+        positions = [
+            {
+                "type": "oneWay",
+                "position": {
+                    "coin": coin,
+                    "szi": str(position["szi"]),
+                    "entryPx": str(position["entryPx"]),
+                    "positionValue": str(abs(position["szi"]) * self.mids[coin]),
+                    "leverage": {"type": "cross", "value": 1},
+                },
+            }
+            for coin, position in account.positions.items() if position["szi"]
+        ]
+        summary = {"accountValue": str(account.value), "totalNtlPos": "0", "totalRawUsd": str(account.value), "totalMarginUsed": "0"}
+        return {
+            "assetPositions": positions,
+            "crossMarginSummary": summary,
+            "marginSummary": summary,
+            "withdrawable": str(account.value),
+            "time": int(time.time() * 1000),
+        }
+
+    def info(self, request):
+        kind = request.get("type")
+        if kind == "meta":
+            return {"universe": self.universe}
+        if kind == "spotMeta":
+            return {"universe": [], "tokens": []}
+        if kind == "clearinghouseState":
+            return self.clearinghouse_state(request["user"])
+        if kind == "openOrders":
+            return list(self.account(request["user"]).orders.values())
+        if kind == "allMids":
+            return self.all_mids()
+        return None
+
+    # /exchange
+
+    def new_order(self, coin, side, px, sz, reduce_only=False):
+        order = {
+            "coin": coin, "side": side, "limitPx": str(px), "sz": str(sz), "origSz": str(sz),
+            "oid": self.next_oid, "timestamp": int(time.time() * 1000), "reduceOnly": reduce_only,
+        }
+        self.next_oid += 1
+        return order
+
+    def place(self, wire):
+        coin = self.universe[wire["a"]]["name"]
+        side = "B" if wire["b"] else "A"
+        account = self.accounts[self.trading]
+        if wire["t"].get("limit", {}).get("tif") == "Ioc":
+            # Market orders fill immediately at the mid price
+            self.copied("trade", coin)
+            sz = float(wire["s"])
+            position = account.positions.setdefault(coin, {"szi": 0.0, "entryPx": self.mids[coin]})
+            position["szi"] = round(position["szi"] + (sz if wire["b"] else -sz), 8)
+            return {"filled": {"totalSz": wire["s"], "avgPx": str(self.mids[coin]), "oid": self.next_oid}}
+        self.copied("place", price_key(coin, side, wire["p"]))
+        order = self.new_order(coin, side, wire["p"], wire["s"], wire["r"])
+        account.orders[order["oid"]] = order
+        self.publish_order(self.trading, order, "open")
+        return {"resting": {"oid": order["oid"]}}
+
+    def cancel(self, cancel):
+        order = self.accounts[self.trading].orders.pop(cancel["o"], None)
+        if order is None:
+            return {"error": "Order was never placed, already canceled, or filled."}
+        self.copied("cancel", price_key(order["coin"], order["side"], order["limitPx"]))
+        self.publish_order(self.trading, order, "canceled")
+        return "success"
+
+    def modify(self, modify):
+        order = self.accounts[self.trading].orders.get(modify["oid"])
+        if order is None:
+            return {"error": "Cannot modify canceled or filled order"}
+        wire = modify["order"]
+        order.update(limitPx=wire["p"], sz=wire["s"], origSz=wire["s"], side="B" if wire["b"] else "A")
+        self.publish_order(self.trading, order, "open")
+        return {"resting": {"oid": order["oid"]}}
+
+    def schedule_cancel(self, at_ms):
+        if self.scheduled_cancel is not None:
+            self.scheduled_cancel.cancel()
+            self.scheduled_cancel = None
+        if at_ms is not None:
+            delay = max(at_ms / 1000 - time.time(), 0)
+            self.scheduled_cancel = asyncio.get_running_loop().call_later(delay, self.cancel_all)
+
+    def cancel_all(self):
+        self.scheduled_cancel = None
+        account = self.accounts[self.trading]
+        for order in list(account.orders.values()):
+            del account.orders[order["oid"]]
+            self.publish_order(self.trading, order, "canceled")
+
+    def exchange(self, request):
+        action = request["action"]
+        kind = action["type"]
+        self.exchange_actions[kind] += 1
+        if kind == "order":
+            statuses = [self.place(wire) for wire in action["orders"]]
+        elif kind == "cancel":
+            statuses = [self.cancel(cancel) for cancel in action["cancels"]]
+        elif kind == "batchModify":
+            statuses = [self.modify(modify) for modify in action["modifies"]]
+        elif kind == "scheduleCancel":
+            self.schedule_cancel(action.get("time"))
+            return {"status": "ok", "response": {"type": "default"}}
+        else:
+            return {"status": "err", "response": f"Unsupported action {kind}"}
+        return {"status": "ok", "response": {"type": kind, "data": {"statuses": statuses}}}
+
+    # /control
+
+    def leader_event(self, event):
+        self.leader_events += 1
+        now = time.monotonic()
+        account = self.accounts[self.leader]
+        if event["type"] == "open":
+            order = self.new_order(event["coin"], event["side"], event["px"], event["sz"])
+            account.orders[order["oid"]] = order
+            self.pending.setdefault(("place", price_key(order["coin"], order["side"], order["limitPx"])), now)
+            self.publish_order(self.leader, order, "open")
+        elif event["type"] == "cancel":
+            key = price_key(event["coin"], event["side"], event["px"])
+            order = account.order_at(key)
+            if order is not None:
+                del account.orders[order["oid"]]
+                self.pending.setdefault(("cancel", key), now)
+                self.publish_order(self.leader, order, "canceled")
+        elif event["type"] == "position":
+            coin = event["coin"]
+            previous = account.positions.get(coin, {"szi": 0.0})["szi"]
+            account.positions[coin] = {"szi": event["szi"], "entryPx": event["entryPx"]}
+            self.pending.setdefault(("trade", coin), now)
+            fill = {
+                "coin": coin, "px": str(self.mids[coin]), "sz": str(abs(event["szi"] - previous)),
+                "side": "B" if event["szi"] > previous else "A", "time": int(time.time() * 1000),
+            }
+            self.publish_state(self.leader, [fill])
+
+    def stats(self):
+        return {
+            "leader_events": self.leader_events,
+            "copied": len(self.latencies),
+            "pending": len(self.pending),
+            "exchange_actions": self.exchange_actions,
+            "window_s": self.last_copy - self.window_start,
+            "latencies_ms": self.latencies,
+            "subscriptions": Counter(sub["type"] for client in self.clients for sub in client.subscriptions),
+            "mids": self.mids,
+        }
+
+    def control(self, method, path, request):
+        if path == "/control/events":
+            for event in request["events"]:
+                self.leader_event(event)
+            return {"ok": True}
+        if path == "/control/stats":
+            return self.stats()
+        if path == "/control/reset":
+            self.reset()
+            return {"ok": True}
+        if path == "/control/meta":
+            # Serve another universe, e.g. the one recorded in a journal being replayed
+            self.universe = request["universe"]
+            for asset in self.universe:
+                self.mids.setdefault(asset["name"], 100.0)
+            return {"ok": True}
+        if path == "/control/account":
+            # Change an account's value, pushed to webData2 subscribers
+            self.account(request["user"]).value = float(request["value"])
+            self.publish_state(request["user"].lower())
+            return {"ok": True}
+        if path == "/control/disconnect":
+            for client in list(self.clients):
+                if request.get("silent"):
+                    client.silent = True
+                else:
+                    client.writer.close()
+            return {"ok": True}
+        return None
+
+    # HTTP
+
+    async def route(self, method, path, body):
+        request = json.loads(body) if body else {}
+        if path.startswith("/control/"):
+            return self.control(method, path, request)
+        await asyncio.sleep(self.latency)
+        if path == "/info":
+            return self.info(request)
+        if path == "/exchange":
+            return self.exchange(request)
+        return None
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get("upgrade", "").lower() == "websocket":
+                    await self.serve_websocket(reader, writer, headers)
+                    break
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                response = await self.route(method, path, body)
+                status = "200 OK" if response is not None else "422 Unprocessable Entity"
+                payload = json.dumps(response).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--leader", required=True, help="address of the account being copied")
+    parser.add_argument("--trading", required=True, help="address all exchange actions are applied to")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--coins", type=int, default=10)
+    parser.add_argument("--account-value", type=float, default=100000)
+    parser.add_argument("--latency-ms", type=float, default=20, help="delay before every /info and /exchange response")
+    parser.add_argument("--ws-latency-ms", type=float, default=5, help="delay before every pushed websocket message")
+    args = parser.parse_args()
+    mock = MockHyperliquid(
+        args.leader, args.trading, args.coins, args.account_value, args.latency_ms / 1000, args.ws_latency_ms / 1000
+    )
+    server = await asyncio.start_server(mock.handle_connection, args.host, args.port)
+    print(f"Mock Hyperliquid API listening on http://{args.host}:{args.port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,11 +1,14 @@
 import asyncio
 import os
+import time
 from hyperliquid.info import Info
 import eth_account
 from eth_account.signers.local import LocalAccount
 from hyperliquid.exchange import Exchange
-from hyperliquid.utils import constants
 from dotenv import load_dotenv
+from exchange_client import AsyncExchange
+from info_client import API_URL
+from metadata import metadata
 
 async def cancel_all_orders():
     # Load environment variables
@@ -13,8 +16,10 @@ async def cancel_all_orders():
 
     # Initialize Hyperliquid
     account: LocalAccount = eth_account.Account.from_key(os.getenv("PRIVATE_KEY_API"))
-    exchange = Exchange(account, constants.MAINNET_API_URL)
-    info = Info(constants.MAINNET_API_URL, skip_ws=True)
+    metadata.load()
+    exchange = AsyncExchange(Exchange(account, API_URL, meta=metadata.meta, spot_meta=metadata.spot_meta))
+    chunk_size = int(os.getenv("BULK_CHUNK_SIZE", "40"))
+    info = Info(API_URL, skip_ws=True, meta=metadata.meta, spot_meta=metadata.spot_meta)
     
     # Get trading address
     trading_address = os.getenv("TRADING_ADDRESS")
@@ -35,40 +40,48 @@ async def cancel_all_orders():
             
         print(f"Found {len(response)} open orders")
         
-        # Cancel each order
-        cancelled = 0
-        failed = 0
-        
+        # One bulk cancel per coin and BULK_CHUNK_SIZE orders, all sent concurrently
+        started = time.monotonic()
+        by_coin = {}
         for order in response:
-            try:
-                coin = order.get('coin')
-                oid = order.get('oid')
-                side = 'Buy' if order.get('side') == 'B' else 'Sell'
-                price = float(order.get('limitPx', 0))
-                size = float(order.get('sz', 0))
-                
-                print(f"Cancelling {side} {size} {coin} @ ${price}")
-                
-                cancel_result = exchange.cancel(coin, oid)
-                if cancel_result["status"] == "ok":
-                    cancelled += 1
-                    print(f"✓ Cancelled order {oid}")
-                else:
-                    failed += 1
-                    print(f"✗ Failed to cancel order {oid}: {cancel_result}")
-                
-            except Exception as e:
-                failed += 1
-                print(f"Error cancelling order: {e}")
-                
+            by_coin.setdefault(order.get('coin'), []).append(order)
+        chunks = [orders[i:i + chunk_size] for orders in by_coin.values() for i in range(0, len(orders), chunk_size)]
+        results = await asyncio.gather(*[cancel_chunk(exchange, chunk) for chunk in chunks])
+        cancelled = sum(results)
+        failed = len(response) - cancelled
+        exchange.shutdown()
+        
         print(f"\nSummary:")
         print(f"Total orders: {len(response)}")
         print(f"Successfully cancelled: {cancelled}")
         print(f"Failed to cancel: {failed}")
+        print(f"Cancelled in {time.monotonic() - started:.2f}s with {len(chunks)} bulk cancels")
         
     except Exception as e:
         print(f"Error fetching open orders: {e}")
 
+async def cancel_chunk(exchange, orders):
+    """Bulk cancel orders of one coin, returns the number cancelled"""
+    for order in orders:
+        side = 'Buy' if order.get('side') == 'B' else 'Sell'
+        print(f"Cancelling {side} {float(order.get('sz', 0))} {order.get('coin')} @ ${float(order.get('limitPx', 0))}")
+    try:
+        cancel_result = await exchange.call("bulk_cancel", [{"coin": order['coin'], "oid": order['oid']} for order in orders])
+    except Exception as e:
+        print(f"Error cancelling {len(orders)} orders: {e}")
+        return 0
+    if cancel_result["status"] != "ok":
+        print(f"✗ Failed to cancel {len(orders)} orders: {cancel_result}")
+        return 0
+    cancelled = 0
+    for order, status in zip(orders, cancel_result["response"]["data"]["statuses"]):
+        if status == "success":
+            cancelled += 1
+            print(f"✓ Cancelled order {order['oid']}")
+        else:
+            print(f"✗ Failed to cancel order {order['oid']}: {status}")
+    return cancelled
+
 async def main():
     try:
         await cancel_all_orders()
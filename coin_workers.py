@@ -0,0 +1,105 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from event_queue import CoalescingQueue
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Monotonic receive time of the update being processed, readable by everything process() awaits
+update_received_at = contextvars.ContextVar("update_received_at", default=None)
+
+class CoinWorkers:
+    """One serial worker per coin, each draining its own coalescing queue
+
+    Updates of a coin are processed strictly in order, one at a time, while different coins are
+    processed in parallel, so a slow BTC cancel does not hold up an ETH placement. A worker holds its
+    coin's lock() while it processes a batch, others take it to keep the coin's updates out meanwhile.
+    """
+
+    def __init__(self, loop, process, maxsize, on_overflow=None, name="", on_batch=None):
+        self.loop = loop
+        self.name = name  # label of the queue wait metric
+        self.process = process  # coroutine function called as process(*update)
+        self.maxsize = maxsize
+        self.on_overflow = on_overflow  # coroutine function called after a coin's queue dropped updates
+        self.on_batch = on_batch  # coroutine function called as on_batch(coin) after each batch of a coin's updates
+        self.queues = {}  # coin -> CoalescingQueue
+        self.workers = {}  # coin -> asyncio.Task
+        self.locks = {}  # coin -> asyncio.Lock
+        self.latency = {}  # coin -> [processed count, total queue latency, max queue latency]
+        self.busy = 0  # workers processing a batch
+        self._lock = threading.Lock()
+
+    def put(self, coin, key, update):
+        """Enqueue an update of a coin, safe to call from any thread"""
+        with self._lock:
+            queue = self.queues.get(coin)
+            if queue is None:
+                queue = self.queues[coin] = CoalescingQueue(self.loop, self.maxsize)
+                self.loop.call_soon_threadsafe(self._start_worker, coin, queue)
+        queue.put(key, (time.monotonic(), update))
+
+    def lock(self, coin):
+        return self.locks.setdefault(coin, asyncio.Lock())
+
+    def _start_worker(self, coin, queue):
+        self.workers[coin] = self.loop.create_task(self._work(coin, queue))
+
+    async def _work(self, coin, queue):
+        while True:
+            batch = await queue.get_batch()
+            self.busy += 1
+            try:
+                async with self.lock(coin):
+                    for key, (received_at, update) in batch:
+                        self._record_latency(coin, time.monotonic() - received_at)
+                        update_received_at.set(received_at)
+                        try:
+                            await self.process(*update)
+                        except Exception:
+                            logger.exception(f"Error processing {key}")
+                    if self.on_batch is not None:
+                        try:
+                            await self.on_batch(coin)
+                        except Exception:
+                            logger.exception(f"Error finishing batch of {coin}")
+                update_received_at.set(None)
+                if queue.take_overflow():
+                    logger.warning(f"Event queue of {coin} overflowed ({queue.stats()})")
+                    if self.on_overflow is not None:
+                        await self.on_overflow()
+            finally:
+                self.busy -= 1
+
+    def _record_latency(self, coin, latency):
+        metrics.QUEUE_WAIT.observe(latency, queue=self.name)
+        stats = self.latency.setdefault(coin, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += latency
+        stats[2] = max(stats[2], latency)
+
+    def queue_stats(self):
+        """Depth, coalesced and dropped updates summed over all coins"""
+        totals = {"depth": 0, "coalesced": 0, "dropped": 0}
+        for queue in list(self.queues.values()):
+            for name, value in queue.stats().items():
+                totals[name] += value
+        return totals
+
+    def latency_stats(self):
+        """Per-coin queue latency, from receiving an update to starting to process it"""
+        return {
+            coin: {"processed": count, "avg_ms": round(total / count * 1000, 1), "max_ms": round(worst * 1000, 1)}
+            for coin, (count, total, worst) in self.latency.items()
+        }
+
+    def idle(self):
+        """Whether every update put so far has been processed"""
+        return self.busy == 0 and self.queue_stats()["depth"] == 0
+
+    def stop(self):
+        for worker in self.workers.values():
+            worker.cancel()
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+from collections import OrderedDict
+
+class CoalescingQueue:
+    """Bounded queue handing websocket updates from the websocket thread to the event loop
+
+    Updates are keyed, a new update for a key that is still pending replaces the pending one in
+    place, so only the latest state of each key gets processed and keys keep their arrival order.
+    When maxsize distinct keys are pending, the oldest pending update is dropped to make room and
+    the queue is flagged as overflowed, the consumer is expected to resync from a snapshot then.
+    """
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.maxsize = maxsize
+        self._pending = OrderedDict()  # key -> latest update
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+        self.coalesced = 0
+        self.dropped = 0
+        self.overflowed = False
+
+    def put(self, key, update):
+        """Enqueue an update, safe to call from any thread"""
+        with self._lock:
+            was_empty = not self._pending
+            if key in self._pending:
+                self._pending[key] = update
+                self.coalesced += 1
+            else:
+                if len(self._pending) >= self.maxsize:
+                    self._pending.popitem(last=False)
+                    self.dropped += 1
+                    self.overflowed = True
+                self._pending[key] = update
+        # Wake the consumer only on the empty -> non-empty transition
+        if was_empty:
+            self.loop.call_soon_threadsafe(self._ready.set)
+
+    async def get_batch(self):
+        """Wait for pending updates and take all of them as a list of (key, update)"""
+        while True:
+            await self._ready.wait()
+            with self._lock:
+                self._ready.clear()
+                batch = list(self._pending.items())
+                self._pending.clear()
+            if batch:
+                return batch
+
+    def take_overflow(self):
+        """Return whether updates were dropped since the last call and reset the flag"""
+        with self._lock:
+            overflowed, self.overflowed = self.overflowed, False
+            return overflowed
+
+    def stats(self):
+        return {"depth": len(self._pending), "coalesced": self.coalesced, "dropped": self.dropped}
@@ -0,0 +1,66 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import hyperliquid.exchange
+from requests.adapters import HTTPAdapter
+import metrics
+from rate_limiter import CANCEL, CANCEL_METHODS, PLACE, exchange_weight, rate_limiter as shared_rate_limiter
+
+_nonce_lock = threading.Lock()
+_last_nonce = 0
+
+def unique_timestamp_ms():
+    ''' Millisecond timestamp that never repeats, concurrent actions signed in the same ms would share a nonce '''
+    global _last_nonce
+    with _nonce_lock:
+        _last_nonce = max(int(time.time() * 1000), _last_nonce + 1)
+        return _last_nonce
+
+# Exchange uses get_timestamp_ms() as the nonce of every signed action
+hyperliquid.exchange.get_timestamp_ms = unique_timestamp_ms
+
+_sign_l1_action = hyperliquid.exchange.sign_l1_action
+
+def timed_sign_l1_action(*args, **kwargs):
+    with metrics.SIGN_SECONDS.time():
+        return _sign_l1_action(*args, **kwargs)
+
+hyperliquid.exchange.sign_l1_action = timed_sign_l1_action
+
+class AsyncExchange:
+    """Runs blocking Exchange actions (EIP-712 signing + HTTP POST) on a bounded thread pool"""
+
+    def __init__(self, exchange, max_workers=None, rate_limiter=None):
+        self.exchange = exchange
+        # Actions wait for rate limit budget, cancels ahead of placements and modifies
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        self.max_workers = max_workers or int(os.getenv("EXCHANGE_CONCURRENCY", "4"))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="exchange")
+        # Keep one pooled connection per worker so concurrent actions don't open new ones
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.exchange.session.mount("https://", adapter)
+        self.exchange.session.mount("http://", adapter)
+        # Time the HTTP round trip apart from signing, every action is posted through Exchange.post
+        self._post = self.exchange.post
+        self.exchange.post = self._timed_post
+
+    def _timed_post(self, url_path, payload=None):
+        with metrics.HTTP_SECONDS.time(endpoint="exchange", type=(payload or {}).get("action", {}).get("type", "")):
+            return self._post(url_path, payload)
+
+    async def call(self, method, *args, **kwargs):
+        """Await Exchange.<method>(*args, **kwargs) without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        batch_length = len(args[0]) if args and isinstance(args[0], list) else 1
+        with metrics.EXCHANGE_ACTION_SECONDS.time(method=method):
+            await self.rate_limiter.acquire(exchange_weight(batch_length), CANCEL if method in CANCEL_METHODS else PLACE)
+            return await loop.run_in_executor(
+                self.executor,
+                functools.partial(getattr(self.exchange, method), *args, **kwargs)
+            )
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -1,55 +1,98 @@
-import logging
+import json
+import os
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from datetime import datetime, timedelta
 import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import metrics
 
-# Thread-safe list to track recent log events
-_last_log_time = 0.0
-_last_error_time = 0.0
-_log_lock = threading.Lock()
+# Heartbeats are plain assignments to these from the websocket, event loop and executor threads,
+# atomic under the GIL, so the hot paths never take a lock and a slow probe never blocks them
+FEED_STALE_SECONDS = float(os.getenv("FEED_STALE_SECONDS", "120"))  # websocket pings arrive every 50s
+SYNC_STALE_SECONDS = float(os.getenv("SYNC_STALE_SECONDS", "300"))
+COPY_LAG_THRESHOLD = float(os.getenv("COPY_LAG_THRESHOLD", "10"))
+COPY_LAG_WINDOW = 300  # a slow copy only counts against readiness for this long
 
-class HealthLogHandler(logging.Handler):
-    def emit(self, record):
-        global _last_log_time, _last_error_time
-        ts = record.created  # float: seconds since epoch
-        with _log_lock:
-            _last_log_time = ts
-            if record.levelno >= logging.ERROR:
-                _last_error_time = ts
+_started = time.monotonic()
+_heartbeats = {}  # name -> monotonic time of the last beat
+_watched = {}  # name -> (max age in seconds, checked for liveness too)
+_copy_lag = (None, 0.0)  # (monotonic time, seconds) of the last copy acked by the exchange
+
+def watch(name, max_age, liveness=False):
+    """Require a heartbeat named name at least every max_age seconds to be ready, and also to be live if liveness"""
+    _watched[name] = (max_age, liveness)
+
+def heartbeat(name):
+    _heartbeats[name] = time.monotonic()
+
+def record_copy_lag(seconds):
+    """Leader event to exchange ack of a copy, doubles as the order ack heartbeat"""
+    global _copy_lag
+    _copy_lag = (time.monotonic(), seconds)
+    heartbeat("ack")
+
+def watch_feed(info, name):
+    """Heartbeat name on every message of an Info's websocket, pongs included, so a quiet but connected feed stays fresh"""
+    watch(name, FEED_STALE_SECONDS)
+    ws = info.ws_manager.ws
+    on_message = ws.on_message
+
+    def beat(ws_app, message):
+        heartbeat(name)
+        on_message(ws_app, message)
+    ws.on_message = beat
+
+def check(readiness):
+    """(healthy, details) of the watched heartbeats, plus copy lag when checking readiness"""
+    now = time.monotonic()
+    healthy = True
+    details = {}
+    for name, (max_age, liveness) in list(_watched.items()):
+        if not (readiness or liveness):
+            continue
+        beat = _heartbeats.get(name)
+        # Liveness gives a check that never beat until max_age after start, readiness needs a first beat
+        age = now - (beat if beat is not None else _started)
+        ok = age <= max_age and (beat is not None or not readiness)
+        details[name] = {"age_s": round(age, 1) if beat is not None else None, "max_age_s": max_age, "ok": ok}
+        healthy = healthy and ok
+    if readiness:
+        lag_at, lag = _copy_lag
+        ok = lag_at is None or now - lag_at > COPY_LAG_WINDOW or lag <= COPY_LAG_THRESHOLD
+        details["copy_lag"] = {"lag_s": round(lag, 3) if lag_at is not None else None, "max_lag_s": COPY_LAG_THRESHOLD, "ok": ok}
+        healthy = healthy and ok
+    return healthy, details
 
 class HealthCheckHandler(BaseHTTPRequestHandler):
     def do_GET(self):
-        if self.path != '/healthz':
+        if self.path == '/metrics':
+            self.respond(200, metrics.render().encode(), 'text/plain; version=0.0.4; charset=utf-8')
+        elif self.path == '/livez':
+            self.respond_check(readiness=False)
+        elif self.path in ('/readyz', '/healthz'):  # /healthz kept for existing probes
+            self.respond_check(readiness=True)
+        else:
             self.send_response(404)
             self.end_headers()
-            return
 
-        now = time.time()
-        with _log_lock:
-            healthy = (
-                (now - _last_log_time <= 300) and  # some recent log
-                (_last_log_time > _last_error_time)  # and it’s not an error or worse
-            )
+    def respond_check(self, readiness):
+        healthy, details = check(readiness)
+        self.respond(200 if healthy else 503, json.dumps(details).encode() + b"\n", 'application/json')
 
-        if healthy:
-            self.send_response(200)
-            self.end_headers()
-            self.wfile.write(b"OK\n")
-        else:
-            self.send_response(503)
-            self.end_headers()
-            self.wfile.write(b"Service Unavailable\n")
+    def respond(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
     def log_message(self, format, *args):
         return  # Suppress HTTP server logging
 
 def _start_server():
-    server = HTTPServer(('localhost', 8181), HealthCheckHandler)
+    # HEALTHCHECK_HOST=0.0.0.0 lets Prometheus scrape /metrics from outside the container
+    server = ThreadingHTTPServer((os.getenv("HEALTHCHECK_HOST", "localhost"), 8181), HealthCheckHandler)
+    server.daemon_threads = True
     server.serve_forever()
 
-# Start HTTP server in a background thread
+# Start HTTP server in a background thread, each request is served on its own thread
 threading.Thread(target=_start_server, daemon=True).start()
-
-# Add our custom log handler to the root logger
-logging.getLogger().addHandler(HealthLogHandler())
\ No newline at end of file
@@ -0,0 +1,102 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from hyperliquid.utils import constants
+from dotenv import load_dotenv
+import journal
+import metrics
+from rate_limiter import INFO, info_weight, rate_limiter as shared_rate_limiter
+
+# The bots load .env after their imports, read it before the module level client below is configured
+load_dotenv(override=True)
+
+# Base URL of the Hyperliquid API, point it at benchmarks/mock_server.py to load test without mainnet funds
+API_URL = os.getenv("HYPERLIQUID_API_URL", constants.MAINNET_API_URL)
+
+class InfoClient:
+    """Keep-alive client for the /info endpoint shared by both bots"""
+
+    # Request type of each method, weighs the request against the rate limit
+    REQUEST_TYPES = {"clearinghouse_state": "clearinghouseState", "open_orders": "openOrders", "all_mids": "allMids"}
+
+    def __init__(self, base_url=API_URL, timeout=None, retries=None, pool_size=None, rate_limiter=None):
+        self.url = base_url + '/info'
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        # (connect, read) timeout in seconds
+        self.timeout = timeout or (3.05, float(os.getenv("INFO_TIMEOUT", "10")))
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0',
+            'Accept': '*/*',
+            'Accept-Encoding': 'gzip, deflate',
+            'Content-Type': 'application/json',
+            'Origin': 'https://app.hyperliquid.xyz',
+            'Referer': 'https://app.hyperliquid.xyz/',
+        })
+        # Info requests are read only, so POSTs are safe to retry
+        retry = Retry(
+            total=retries if retries is not None else int(os.getenv("INFO_RETRIES", "3")),
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None,
+            respect_retry_after_header=True,
+        )
+        self.pool_size = pool_size or int(os.getenv("INFO_POOL_SIZE", "4"))
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        # Bounds the fan-out of concurrent requests to the size of the connection pool
+        self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="info")
+
+    async def call(self, method, *args, **kwargs):
+        """Await <method>(*args, **kwargs) of this client without blocking the event loop
+
+        Waits for rate limit budget behind queued exchange actions first, raises RateLimited when shed.
+        """
+        await self.rate_limiter.acquire(info_weight(self.REQUEST_TYPES.get(method)), INFO)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(getattr(self, method), *args, **kwargs)
+        )
+
+    def post(self, payload, timeout=None):
+        with metrics.HTTP_SECONDS.time(endpoint="info", type=payload["type"]):
+            response = self.session.post(self.url, json=payload, timeout=timeout or self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        journal.record("info", {"request": payload, "response": data})
+        return data
+
+    def clearinghouse_state(self, user):
+        return self.post({"type": "clearinghouseState", "user": user})
+
+    def open_orders(self, user):
+        return self.post({"type": "openOrders", "user": user})
+
+    def all_mids(self):
+        return self.post({"type": "allMids"})
+
+    def connection_stats(self):
+        """Requests served over reused keep-alive connections vs. newly opened ones"""
+        pools = self.adapter.poolmanager.pools
+        pools = [pools[key] for key in pools.keys()]
+        requests_sent = sum(pool.num_requests for pool in pools)
+        new_connections = sum(pool.num_connections for pool in pools)
+        return {
+            "requests": requests_sent,
+            "new_connections": new_connections,
+            "reused_connections": requests_sent - new_connections,
+        }
+
+# Shared by all callers in the process so they reuse one connection pool
+info_client = InfoClient()
+metrics.Gauge(
+    "copytrader_info_requests",
+    "Info requests and the connections opened to serve them",
+    lambda: {(("stat", stat),): value for stat, value in info_client.connection_stats().items()},
+)
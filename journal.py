@@ -0,0 +1,143 @@
+import gzip
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Record header: monotonic time in ns, channel name length, JSON payload length
+HEADER = struct.Struct("<qHI")
+_STOP = object()
+
+class JournalWriter:
+    """Appends (monotonic ns, channel, message) records to gzip compressed, size rotated segment files
+
+    record() only enqueues the message, JSON encoding, compression and disk writes happen on a
+    background thread. When the queue is full messages are dropped rather than blocking the caller.
+    """
+
+    def __init__(self, directory, name, segment_bytes=None, queue_size=None, flush_interval=1.0):
+        self.directory = directory
+        self.name = name
+        self.segment_bytes = segment_bytes or int(float(os.getenv("JOURNAL_SEGMENT_MB", "64")) * 2 ** 20)  # uncompressed
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size or int(os.getenv("JOURNAL_QUEUE_SIZE", "100000")))
+        self.segments = 0
+        self.written = 0
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self.thread.start()
+
+    def record(self, channel, message):
+        """Journal a message, safe to call from any thread"""
+        try:
+            self.queue.put_nowait((time.monotonic_ns(), channel, message))
+        except queue.Full:
+            self.dropped += 1
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{self.segments:04d}.journal.gz")
+        self.segments += 1
+        logger.info(f"Journal segment {path}")
+        return gzip.open(path, "wb", compresslevel=1)
+
+    def _run(self):
+        segment = None
+        segment_size = 0
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            if item is not None:
+                monotonic_ns, channel, message = item
+                try:
+                    payload = json.dumps(message, separators=(",", ":")).encode()
+                except (TypeError, ValueError):
+                    logger.exception(f"Cannot journal {channel} message")
+                    continue
+                channel_bytes = channel.encode()
+                if segment is None or segment_size >= self.segment_bytes:
+                    if segment is not None:
+                        segment.close()
+                    segment = self._open_segment()
+                    segment_size = 0
+                segment.write(HEADER.pack(monotonic_ns, len(channel_bytes), len(payload)) + channel_bytes + payload)
+                segment_size += HEADER.size + len(channel_bytes) + len(payload)
+                self.written += 1
+            # Sync flush so a crash loses at most flush_interval of traffic
+            if segment is not None and time.monotonic() - last_flush >= self.flush_interval:
+                segment.flush()
+                last_flush = time.monotonic()
+        if segment is not None:
+            segment.close()
+
+    def close(self):
+        self.queue.put(_STOP)
+        self.thread.join()
+        logger.info(f"Journal closed, {self.written} records written, {self.dropped} dropped")
+
+_writer = None
+
+def start(name, context=None):
+    """Start journaling inbound traffic to JOURNAL_DIR if it is set, context is recorded as the first record"""
+    global _writer
+    directory = os.getenv("JOURNAL_DIR")
+    if directory and _writer is None:
+        _writer = JournalWriter(directory, name)
+        _writer.record("start", context or {})
+    return _writer
+
+def stop():
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+def record(channel, message):
+    if _writer is not None:
+        _writer.record(channel, message)
+
+def recorded(channel, callback):
+    """Websocket callback journaling every message before handling it, the callback itself when not journaling"""
+    if _writer is None:
+        return callback
+    writer = _writer
+
+    def record_and_handle(msg):
+        writer.record(channel, msg)
+        callback(msg)
+    return record_and_handle
+
+def read(path, name=""):
+    """Yield (monotonic ns, channel, message) from a journal segment, or from the segments of a directory
+    whose file names start with name, in order"""
+    if os.path.isdir(path):
+        paths = sorted(
+            os.path.join(path, file_name) for file_name in os.listdir(path)
+            if file_name.startswith(name) and file_name.endswith(".journal.gz")
+        )
+    else:
+        paths = [path]
+    for segment_path in paths:
+        with gzip.open(segment_path, "rb") as segment:
+            try:
+                while True:
+                    header = segment.read(HEADER.size)
+                    if len(header) < HEADER.size:
+                        break
+                    monotonic_ns, channel_length, payload_length = HEADER.unpack(header)
+                    body = segment.read(channel_length + payload_length)
+                    if len(body) < channel_length + payload_length:
+                        break
+                    yield monotonic_ns, body[:channel_length].decode(), json.loads(body[channel_length:])
+            except EOFError:
+                logger.warning(f"Journal segment {segment_path} is truncated, the writer did not close it")
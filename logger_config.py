@@ -1,34 +1,58 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 import socket
 import sentry_sdk
 from sentry_sdk.integrations.logging import LoggingIntegration
 
+LOG_FORMAT = '%(asctime)s|%(levelname)5s| %(message)s'
+
+_listener = None
+
+def start_log_writer():
+    """Route root logging through a queue, records are formatted and written to stdout by a background thread
+
+    Replaces basicConfig, which does nothing once any root handler has been added by an earlier import.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    log_queue = queue.SimpleQueue()
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    _listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+    _listener.start()
+    # Flush the records still queued on exit
+    atexit.register(_listener.stop)
+    logging.getLogger().addHandler(logging.handlers.QueueHandler(log_queue))
 
 def setup_logging(service_name):
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s|%(levelname)5s| %(message)s')
+    level = logging.getLevelName(os.getenv('LOG_LEVEL', 'INFO').upper())
+    logging.getLogger().setLevel(level)
+    start_log_writer()
 
     # Configure Sentry
     sentry_dsn = os.getenv('SENTRY_DSN', '')
     hostname = socket.gethostname()
     if sentry_dsn and hostname != 'carbon': # Do not send logs from developer machine 'carbon'
         sentry_logging = LoggingIntegration(
-            level=logging.INFO,        # Capture info and above as breadcrumbs
+            # Breadcrumbs are recorded by the logging caller, at INFO that is every log line
+            level=logging.getLevelName(os.getenv('SENTRY_BREADCRUMB_LEVEL', 'WARNING').upper()),
             event_level=logging.ERROR  # Send errors as events
         )
         sentry_sdk.init(
             dsn=sentry_dsn,
             integrations=[sentry_logging],
-            traces_sample_rate=1.0,
+            traces_sample_rate=float(os.getenv('SENTRY_TRACES_SAMPLE_RATE', '0')),
             environment=os.getenv('ENVIRONMENT', 'production'),
             release=os.getenv('RELEASE'),
             server_name=os.getenv('PROFILE', ''),
-            enable_tracing=True
         )
     else:
         logging.info("Sentry is disabled")
 
-    # Configure logging - using default handlers
     logger = logging.getLogger(service_name)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(level)
     return logger
@@ -0,0 +1,52 @@
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MidPriceCache:
+    """Mid prices kept current by the allMids websocket stream, falling back to REST for stale coins"""
+
+    def __init__(self, fetch_mids, max_age=None):
+        self.fetch_mids = fetch_mids  # coroutine function returning the allMids map over REST
+        self.max_age = max_age or float(os.getenv("MID_MAX_AGE", "5"))
+        self.mids = {}  # coin -> mid price string, as sent by the exchange
+        self.updated_at = {}  # coin -> monotonic time of the last update
+        self.rest_fallbacks = 0
+
+    def handle_all_mids(self, msg):
+        """allMids websocket callback (called from the websocket thread)"""
+        mids = msg.get("data", {}).get("mids")
+        if mids:
+            self.update(mids)
+
+    def update(self, mids):
+        now = time.monotonic()
+        for coin, mid in mids.items():
+            self.mids[coin] = mid
+            self.updated_at[coin] = now
+
+    def age(self, coin):
+        updated_at = self.updated_at.get(coin)
+        return time.monotonic() - updated_at if updated_at is not None else float("inf")
+
+    def is_stale(self, coin):
+        return self.age(coin) > self.max_age
+
+    async def refresh(self):
+        self.rest_fallbacks += 1
+        self.update(await self.fetch_mids())
+
+    async def get(self, coin):
+        """Mid price of a coin, only hits REST when the streamed price is stale"""
+        if self.is_stale(coin):
+            logger.debug(f"Mid price of {coin} is stale ({self.age(coin):.1f}s), refreshing over REST")
+            await self.refresh()
+        return float(self.mids[coin])
+
+    async def get_prices(self, coins):
+        """Mid price strings of all coins, refreshing over REST once if any of them is stale"""
+        if any(self.is_stale(coin) for coin in coins):
+            await self.refresh()
+        # dict() copies atomically, the websocket thread may be updating the map
+        return dict(self.mids)
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlparse
+from info_client import API_URL, info_client
+
+logger = logging.getLogger(__name__)
+
+# Directory for state kept across restarts
+STATE_DIR = os.getenv("STATE_DIR", "state")
+
+def write_json(path, data):
+    """Write data to path as JSON, through a rename so a crash mid-write can't leave a truncated file behind"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+class Metadata:
+    """Perp and spot universe metadata shared by both bots, cached on disk
+
+    load() serves the cached copy and refreshes it in the background once it is older than ttl, so a
+    restart does not wait for a download. A coin listed since is picked up by ensure(), which refreshes
+    lazily, at most every min_refresh_interval, with concurrent refreshes sharing one download. Coins
+    a refresh did not find, e.g. spot coins, are not looked up again until the cache is older than ttl.
+    """
+
+    def __init__(self, base_url=API_URL, directory=STATE_DIR, ttl=None, min_refresh_interval=None):
+        # One cache per API, the mock server serves another universe than mainnet
+        self.path = os.path.join(directory, f"meta-{urlparse(base_url).netloc.replace(':', '_')}.json")
+        self.ttl = ttl if ttl is not None else float(os.getenv("META_CACHE_TTL", "3600"))
+        # Spot and other coins missing from the perp universe would otherwise trigger a download per order
+        self.min_refresh_interval = (
+            min_refresh_interval if min_refresh_interval is not None else float(os.getenv("META_MIN_REFRESH_INTERVAL", "30"))
+        )
+        self.meta = None
+        self.spot_meta = None
+        self.fetched_at = 0.0  # wall-clock time of the download
+        # coin -> szDecimals and maxLeverage, updated in place so holders of the dicts see new listings
+        self.sz_decimals = {}
+        self.max_leverage = {}
+        self.unknown = set()  # coins missing from a refresh ensure() waited for
+        self.infos = []  # SDK Info instances whose coin tables follow refreshes, e.g. Exchange.info
+        self._lock = threading.Lock()
+        self._refresh = None  # Future of the download in flight or last done
+        self._last_refresh = float("-inf")
+
+    def load(self):
+        """Serve the disk cache, downloading only when there is none, and refresh it in the background when stale"""
+        cached = self._read_cache()
+        if cached is None:
+            self.refresh().result()
+            return self
+        self._apply(*cached)
+        age = time.time() - self.fetched_at
+        logger.info(f"Loaded metadata of {len(self.sz_decimals)} coins from {self.path}, {age:.0f}s old")
+        if age > self.ttl:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            self.refresh(loop)
+        return self
+
+    def refresh(self, loop=None):
+        """Download the metadata on a background thread, returns the Future of the download already in flight if any
+
+        With loop, the requests wait for rate limit budget on that loop, which must not block on the Future.
+        """
+        with self._lock:
+            if self._refresh is None or self._refresh.done():
+                self._refresh = Future()
+                self._last_refresh = time.monotonic()
+                threading.Thread(target=self._download, args=(self._refresh, loop), name="metadata", daemon=True).start()
+            return self._refresh
+
+    async def ensure(self, *coins):
+        """Refresh if any of coins is unknown, e.g. listed after start, returns the set of coins still unknown"""
+        missing = {coin for coin in coins if coin not in self.sz_decimals}
+        if not missing or (missing <= self.unknown and time.time() - self.fetched_at < self.ttl):
+            return missing
+        with self._lock:
+            in_flight = self._refresh is not None and not self._refresh.done()
+            due = time.monotonic() - self._last_refresh >= self.min_refresh_interval
+        if in_flight or due:
+            try:
+                await asyncio.wrap_future(self.refresh(asyncio.get_running_loop()))
+            except Exception:
+                pass  # logged by the download, the coins stay unknown
+            else:
+                self.unknown |= {coin for coin in missing if coin not in self.sz_decimals}
+        return {coin for coin in missing if coin not in self.sz_decimals}
+
+    def tick_decimals(self, coin):
+        """Max price decimals of a perp, prices are also limited to 5 significant figures"""
+        return max(6 - self.sz_decimals[coin], 0)
+
+    def attach(self, info):
+        """Keep an SDK Info's perp coin tables current, so it can place orders on new listings"""
+        self.infos.append(info)
+        if self.meta is not None:
+            self._update_info(info, self.meta)
+
+    def _download(self, future, loop):
+        try:
+            meta = self._post({"type": "meta"}, loop)
+            spot_meta = self._post({"type": "spotMeta"}, loop)
+            listed = [asset["name"] for asset in meta["universe"] if asset["name"] not in self.sz_decimals]
+            self._apply(meta, spot_meta, time.time())
+            self._write_cache()
+            if listed and len(listed) < len(meta["universe"]):
+                logger.info(f"New listings: {', '.join(listed)}")
+            future.set_result(self)
+        except Exception as e:
+            logger.exception("Failed to refresh exchange metadata")
+            future.set_exception(e)
+
+    @staticmethod
+    def _post(payload, loop):
+        if loop is None:
+            return info_client.post(payload)
+        # Weighed against the budget the bot's orders share, the rate limiter runs on the event loop
+        return asyncio.run_coroutine_threadsafe(info_client.call("post", payload), loop).result()
+
+    def _apply(self, meta, spot_meta, fetched_at):
+        for asset in meta["universe"]:
+            self.sz_decimals[asset["name"]] = asset["szDecimals"]
+            self.max_leverage[asset["name"]] = asset.get("maxLeverage")
+        for info in self.infos:
+            self._update_info(info, meta)
+        self.meta, self.spot_meta, self.fetched_at = meta, spot_meta, fetched_at
+
+    @staticmethod
+    def _update_info(info, meta):
+        # Same tables Info.__init__ builds, perp asset ids are universe indices
+        for asset, asset_info in enumerate(meta["universe"]):
+            info.coin_to_asset[asset_info["name"]] = asset
+            info.name_to_coin[asset_info["name"]] = asset_info["name"]
+            info.asset_to_sz_decimals[asset] = asset_info["szDecimals"]
+
+    def _read_cache(self):
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+            return cached["meta"], cached["spot_meta"], cached["fetched_at"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_cache(self):
+        try:
+            write_json(self.path, {"meta": self.meta, "spot_meta": self.spot_meta, "fetched_at": self.fetched_at})
+        except OSError:
+            logger.exception(f"Failed to write the metadata cache {self.path}")
+
+# Shared by all users in the process, loaded by the bots at startup
+metadata = Metadata()
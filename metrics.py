@@ -0,0 +1,117 @@
+import bisect
+import threading
+import time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry = []
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}  # sorted label items -> value
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self.values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Gauge:
+    """Gauge read from a callback returning {label items: value} at scrape time"""
+
+    def __init__(self, name, help, collect):
+        self.name = name
+        self.help = help
+        self.collect = collect
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, value in self.collect().items():
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.values = {}  # sorted label items -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in self.values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+def render():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Hot path timings shared by both bots
+WS_RECEIVE_LAG = Histogram("copytrader_ws_receive_lag_seconds", "Exchange event timestamp to websocket message received, includes clock skew")
+QUEUE_WAIT = Histogram("copytrader_queue_wait_seconds", "Time an update waits in its coin queue before processing")
+SIGN_SECONDS = Histogram("copytrader_sign_seconds", "EIP-712 signing time of an exchange action")
+HTTP_SECONDS = Histogram("copytrader_http_seconds", "HTTP round trip of an info request or exchange action")
+EXCHANGE_ACTION_SECONDS = Histogram("copytrader_exchange_action_seconds", "Exchange action from submission to ack, including executor wait")
+COPY_LATENCY = Histogram("copytrader_copy_latency_seconds", "Leader event received to our order or fill acked by the exchange")
+WS_DISCONNECTS = Counter("copytrader_ws_disconnects_total", "Websocket connections found closed or silent, per feed")
+WS_RECOVERY_SECONDS = Histogram("copytrader_ws_recovery_seconds", "Lost websocket detected to reconnected and resynced, per feed")
+CYCLE_SECONDS = Histogram("copytrader_cycle_seconds", "Wall-clock time of a sync cycle")
+
+# Order outcomes, labelled by bot, action (place, cancel, modify, trade) and outcome
+ORDERS = Counter("copytrader_orders_total", "Orders by outcome: placed, cancelled, modified, filled, skipped_too_small, rejected")
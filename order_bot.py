@@ -1,14 +1,25 @@
 import asyncio
+import contextlib
 import os
-import datetime
+import json
 import math
+import signal
+import time
+from collections import OrderedDict
 from hyperliquid.info import Info
-import requests
 import eth_account
 from eth_account.signers.local import LocalAccount
 from hyperliquid.exchange import Exchange
-from hyperliquid.utils import constants
 from dotenv import load_dotenv
+from coin_workers import CoinWorkers, update_received_at
+from exchange_client import AsyncExchange
+from ws_supervisor import WebsocketSupervisor
+from info_client import API_URL, info_client
+import journal
+from order_store import OrderStore, OrderTotals, PriceBuckets, to_lots
+from metadata import STATE_DIR, metadata, write_json
+from rate_limiter import RateLimited, rate_limiter
+import metrics
 from logger_config import setup_logging
 import healthcheck
 
@@ -22,14 +33,27 @@ class OrderBot:
     def __init__(self):
         # Initialize Hyperliquid
         self.account: LocalAccount = eth_account.Account.from_key(os.getenv("PRIVATE_KEY_API"))
+        # Exchange metadata from the disk cache, so the SDK clients below don't each download it
+        metadata.load()
         self.exchange = Exchange(
             self.account, 
-            constants.MAINNET_API_URL, 
+            API_URL, 
+            meta=metadata.meta,
             vault_address=os.getenv("VAULT_ADDRESS", "") or None, 
-            account_address=os.getenv("ACCOUNT_ADDRESS", "") or None
+            account_address=os.getenv("ACCOUNT_ADDRESS", "") or None,
+            spot_meta=metadata.spot_meta,
         )
-        self.info = Info(constants.MAINNET_API_URL, skip_ws=False)  # Enable WebSocket
-        self.info2 = Info(constants.MAINNET_API_URL, skip_ws=False)  # Enable WebSocket
+        metadata.attach(self.exchange.info)
+        # Signed exchange actions run on a bounded thread pool, EXCHANGE_CONCURRENCY actions in flight at most
+        self.exchange_client = AsyncExchange(self.exchange)
+        self.info = Info(API_URL, skip_ws=False, meta=metadata.meta, spot_meta=metadata.spot_meta)  # Enable WebSocket
+        self.info2 = Info(API_URL, skip_ws=False, meta=metadata.meta, spot_meta=metadata.spot_meta)  # Enable WebSocket
+        # Reconnect silent or closed websockets and resync the account whose updates may have been missed
+        self.supervisors = {
+            "copy": WebsocketSupervisor(self.info, API_URL, "copy", self.resync_after_reconnect),
+            "my": WebsocketSupervisor(self.info2, API_URL, "my", self.resync_after_reconnect),
+        }
+        self.supervisor_tasks = []
 
         # Configuration from environment variables
         self.ACCOUNT_TO_COPY = os.getenv("ACCOUNT_TO_COPY")
@@ -38,141 +62,288 @@ class OrderBot:
         self.TRADE_LIMIT = 10
         self.MINI_ALLOC_OF_PF = 0
         self.SLEEP_INTERVAL = int(os.getenv("SLEEP_INTERVAL", "5"))
+        self.BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "40"))  # orders per bulk exchange action
+        self.MAX_RECONCILE_INTERVAL = float(os.getenv("MAX_RECONCILE_INTERVAL", "60"))  # book digest check backs off up to this
+        self.FULL_SYNC_INTERVAL = float(os.getenv("FULL_SYNC_INTERVAL", "300"))  # full snapshot_sync at least this often
+        # Merge copy account orders into buckets this many basis points wide, one follower order each, 0 copies them one by one
+        self.PRICE_BUCKET_BPS = float(os.getenv("PRICE_BUCKET_BPS", "0"))
+        self.EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "500"))  # pending order keys per account and coin
+        self.ACCOUNT_VALUE_MAX_AGE = float(os.getenv("ACCOUNT_VALUE_MAX_AGE", "60"))  # older streamed values are fetched over REST
+        # Warm restart: keep our orders on the book at shutdown and resume from a checkpoint of the tracked books
+        self.WARM_RESTART = os.getenv("WARM_RESTART", "0") == "1"
+        self.CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", "30"))
+        self.CHECKPOINT_MAX_AGE = float(os.getenv("CHECKPOINT_MAX_AGE", "3600"))  # older checkpoints start cold
+        self.checkpoint_path = os.path.join(STATE_DIR, f"order_bot-{(self.TRADING_ADDRESS or '').lower()}.json")
+        self.last_checkpoint = 0
+        # Exchange side dead man's switch: all our orders are cancelled unless renewed within this many seconds, 0 disables
+        self.DEAD_MAN_SWITCH = float(os.getenv("DEAD_MAN_SWITCH", "0"))
+        if 0 < self.DEAD_MAN_SWITCH < 15:
+            # Renewed every third of it, and the exchange rejects cancel times less than 5s ahead
+            logger.warning(f"DEAD_MAN_SWITCH of {self.DEAD_MAN_SWITCH:g}s is below the 15s minimum, using 15s")
+            self.DEAD_MAN_SWITCH = 15.0
+        self.dead_man_task = None
 
-        # Get exchange metadata
-        meta = self.info.meta()
-        
-        # Create szDecimals map
-        self.sz_decimals = {}
-        for asset_info in meta["universe"]:
-            self.sz_decimals[asset_info["name"]] = asset_info["szDecimals"]
+        journal.record("meta", metadata.meta)
+        # coin -> szDecimals, picks up new listings when metadata refreshes
+        self.sz_decimals = metadata.sz_decimals
+        # Coins of the last snapshot missing from the metadata, logged when they change
+        self.unknown_coins = set()
+        # Keys of copy orders too small to follow, logged and counted once until they become placeable
+        self.skipped_keys = set()
         
         # Store copy account orders and my orders
-        self.copy_account_orders = {}
-        self.my_orders = {}
+        self.copy_account_orders = OrderStore(self.sz_decimals)
+        self.my_orders = OrderStore(self.sz_decimals)
+        # Oids of our orders that were cancelled or filled, newest last, so a late placement ack can't track them again
+        self.closed_oids = OrderedDict()
+        # The book our orders follow, keyed like my_orders: the copy account's orders summed per price or their price buckets
+        self.buckets = PriceBuckets(self.copy_account_orders, self.PRICE_BUCKET_BPS) if self.PRICE_BUCKET_BPS > 0 else None
+        self.target_orders = self.buckets if self.buckets is not None else OrderTotals(self.copy_account_orders)
+        self.dirty_buckets = {}  # coin -> bucket keys changed by the batch of updates being processed
         
-        # Account values
+        # Account values, streamed from webData2 and fetched over REST by the sync loop when the stream goes quiet
         self.copy_account_value = 0
         self.my_account_value = 0
-        
-        # Last sync time
-        self.last_sync_time = 0
+        self.account_value_at = {"copy": float("-inf"), "my": float("-inf")}  # monotonic time of the last value
+        # Wall-clock timings of the last snapshot_sync
+        self.cycle_timings = {}
+        # Last logged order summary per title, only changes are logged
+        self.order_summaries = {}
+
+        # Adaptive reconciliation state
+        self.reconcile_interval = self.SLEEP_INTERVAL
+        self.divergent_checks = 0
+        self.last_full_sync = 0
+        # Snapshot syncs replace the books, one at a time
+        self.sync_lock = asyncio.Lock()
 
         self.loop = asyncio.get_running_loop()
+
+        # Websocket updates are handed to per-coin workers through bounded coalescing queues
+        self.copy_workers = CoinWorkers(
+            self.loop, self.process_copy_account_order, self.EVENT_QUEUE_SIZE, self.resync_after_overflow, name="copy",
+            on_batch=self.sync_buckets if self.buckets is not None else None,
+        )
+        self.my_workers = CoinWorkers(
+            self.loop, self.process_my_order, self.EVENT_QUEUE_SIZE, self.resync_after_overflow, name="my"
+        )
+        metrics.Gauge("copytrader_event_queue", "Event queue depth, coalesced and dropped updates per account", self.queue_gauges)
         logger.info(f"OrderBot initialized with account_to_copy={self.ACCOUNT_TO_COPY}, trading_address={self.TRADING_ADDRESS}")
 
     async def get_account_value(self, address):
         try:
-            response = await self.loop.run_in_executor(
-                None,
-                lambda: requests.post(
-                    'https://api.hyperliquid.xyz/info',
-                    json={"type": "clearinghouseState", "user": address},
-                    timeout=10
-                )
-            )
-            data = response.json()
+            data = await info_client.call("clearinghouse_state", address)
             return float(data['crossMarginSummary']['accountValue'])
+        except RateLimited as e:
+            logger.warning(f"Skipped account value fetch for {address}: {e}")
+            return None
         except Exception as e:
             logger.exception(f"Error fetching account value for {address}")
-            return 0
+            return None
 
     async def get_open_orders(self, address):
         try:
-            response = await self.loop.run_in_executor(
-                None,
-                lambda: requests.post(
-                    'https://api.hyperliquid.xyz/info',
-                    json={"type": "openOrders", "user": address},
-                    timeout=10
-                )
-            )
-            orders = response.json()
+            orders = await info_client.call("open_orders", address)
             logger.debug(f"Fetched {len(orders)} open orders for {address}")
             return orders
+        except RateLimited as e:
+            logger.warning(f"Skipped open orders fetch for {address}: {e}")
+            return None
         except Exception as e:
             logger.exception(f"Error fetching open orders for {address}")
-            return []
+            return None
 
     async def cancel_order(self, coin, oid):
+        return (await self.bulk_cancel_orders([(coin, oid)]))[0]
+
+    async def bulk_cancel_orders(self, cancels):
+        """Cancel (coin, oid) pairs using chunked bulk cancel actions, returns a success flag per order"""
+        return await self.gather_chunks(self.cancel_chunk, cancels)
+
+    async def cancel_chunk(self, chunk):
         try:
-            cancel_result = self.exchange.cancel(coin, oid)
-            if cancel_result["status"] == "ok":
-                logger.info(f"Successfully cancelled order {oid} for {coin}")
-                return True
-            logger.error(f"Failed to cancel order {oid} for {coin}: {cancel_result}")
-            return False
-        except Exception as e:
-            logger.exception(f"Error cancelling order {oid} for {coin}")
-            return False
+            cancel_result = await self.exchange_client.call(
+                "bulk_cancel", [{"coin": coin, "oid": oid} for coin, oid in chunk]
+            )
+            self.record_copy_latency("cancel")
+            if cancel_result["status"] != "ok":
+                logger.error(f"Failed to cancel {len(chunk)} orders: {cancel_result}")
+                self.record_orders("cancel", "rejected", len(chunk))
+                return [False] * len(chunk)
+            results = []
+            statuses = cancel_result["response"]["data"]["statuses"]
+            for (coin, oid), status in zip(chunk, statuses):
+                if status == "success":
+                    logger.info(f"Successfully cancelled order {oid} for {coin}")
+                    self.record_orders("cancel", "cancelled")
+                    results.append(True)
+                else:
+                    logger.error(f"Failed to cancel order {oid} for {coin}: {status}")
+                    self.record_orders("cancel", "rejected")
+                    results.append(False)
+            return results
+        except Exception:
+            logger.exception(f"Error cancelling {len(chunk)} orders")
+            return [False] * len(chunk)
 
     async def place_limit_order(self, coin, is_buy, size, price, reduce_only=False):
+        order = {"coin": coin, "is_buy": is_buy, "sz": size, "limit_px": price, "reduce_only": reduce_only}
+        return (await self.bulk_place_limit_orders([order]))[0]
+
+    async def bulk_place_limit_orders(self, orders):
+        """Place GTC limit orders using chunked bulk order actions, returns a success flag per order"""
+        return await self.gather_chunks(self.place_chunk, orders)
+
+    async def place_chunk(self, chunk):
         try:
-            order_type = 'buy' if is_buy else 'sell'
-            logger.info(f"Placing {order_type} limit order for {size} {coin} @ ${price} (reduce_only={reduce_only})")
-            
-            order_result = self.exchange.order(
-                coin,
-                is_buy,
-                size,
-                price,
-                {"limit": {"tif": "Gtc"}},
-                reduce_only=reduce_only
+            for order in chunk:
+                order_type = 'buy' if order["is_buy"] else 'sell'
+                logger.info(f"Placing {order_type} limit order for {order['sz']} {order['coin']} @ ${order['limit_px']} (reduce_only={order['reduce_only']})")
+
+            order_result = await self.exchange_client.call(
+                "bulk_orders", [{**order, "order_type": {"limit": {"tif": "Gtc"}}} for order in chunk]
             )
-            if order_result["status"] == "ok":
-                status = order_result["response"]["data"]["statuses"][0]
+            self.record_copy_latency("place")
+            if order_result["status"] != "ok":
+                logger.error(f"Error placing {len(chunk)} limit orders: {order_result}")
+                self.record_orders("place", "rejected", len(chunk))
+                return [False] * len(chunk)
+            statuses = order_result["response"]["data"]["statuses"]
+            return [await self.handle_order_status(order, status) for order, status in zip(chunk, statuses)]
+        except Exception:
+            logger.exception(f"Exception placing {len(chunk)} limit orders")
+            return [False] * len(chunk)
+
+    async def modify_order(self, oid, order):
+        return (await self.bulk_modify_orders([(oid, order)]))[0]
+
+    async def bulk_modify_orders(self, modifies):
+        """Modify (oid, order) pairs in place using chunked batch modify actions, returns a success flag per order"""
+        return await self.gather_chunks(self.modify_chunk, modifies)
+
+    async def modify_chunk(self, chunk):
+        try:
+            for oid, order in chunk:
+                logger.info(f"Modifying order {oid} to {order['sz']} {order['coin']} @ ${order['limit_px']}")
+
+            modify_result = await self.exchange_client.call(
+                "bulk_modify_orders_new",
+                [{"oid": oid, "order": {**order, "order_type": {"limit": {"tif": "Gtc"}}}} for oid, order in chunk]
+            )
+            self.record_copy_latency("modify")
+            if modify_result["status"] != "ok":
+                logger.warning(f"Failed to modify {len(chunk)} orders: {modify_result}")
+                self.record_orders("modify", "rejected", len(chunk))
+                return [False] * len(chunk)
+            results = []
+            statuses = modify_result["response"]["data"]["statuses"]
+            for (oid, order), status in zip(chunk, statuses):
                 if "error" in status:
-                    if status["error"].startswith("Reduce only order would increase position") and reduce_only:
-                        logger.info(f"Reduce only order would increase position for {size} {coin} @ ${price}, shrinking")
-                        new_size = self.floor_to_decimals(size * 0.75, self.sz_decimals[coin])
-                        min_size = 1 / (10 ** self.sz_decimals[coin])
-                        if new_size < min_size or new_size * price < self.TRADE_LIMIT:
-                            logger.info(f"New size {new_size} is too small, skipping order")
-                            return False
-                        return await self.place_limit_order(coin, is_buy, new_size, price, reduce_only)
-                    else:
-                        logger.error(f"Error in order response for {coin} {size} @ ${price}: {status['error']}")
-                        return False
-                logger.info(f"Successfully placed {order_type} order for {size} {coin} @ ${price}")
-                return True
-            logger.error(f"Error placing limit order for {coin}: {order_result}")
-            return False
-        except Exception as e:
-            logger.exception(f"Exception in place_limit_order for {coin}")
+                    logger.warning(f"Failed to modify order {oid} for {order['coin']}: {status['error']}")
+                    self.record_orders("modify", "rejected")
+                    results.append(False)
+                else:
+                    logger.info(f"Successfully modified order {oid} for {order['coin']}")
+                    self.record_orders("modify", "modified")
+                    results.append(True)
+            return results
+        except Exception:
+            logger.exception(f"Exception modifying {len(chunk)} orders")
+            return [False] * len(chunk)
+
+    async def gather_chunks(self, chunk_handler, items):
+        """Send chunks of items concurrently, results are flattened back in the original order"""
+        chunk_results = await asyncio.gather(*[
+            chunk_handler(chunk) for chunk in self.chunked(items, self.BULK_CHUNK_SIZE)
+        ])
+        return [result for results in chunk_results for result in results]
+
+    async def resize_orders(self, modifies):
+        """Resize (oid, order) pairs with a batch modify, falling back to cancel and replace for rejected modifies"""
+        results = await self.bulk_modify_orders(modifies)
+        rejected = [i for i, modified in enumerate(results) if not modified]
+        if not rejected:
+            return results
+
+        logger.info(f"Falling back to cancel and replace for {len(rejected)} orders")
+        cancelled = await self.bulk_cancel_orders([(modifies[i][1]['coin'], modifies[i][0]) for i in rejected])
+        replace = [i for i, ok in zip(rejected, cancelled) if ok]
+        placed = await self.bulk_place_limit_orders([modifies[i][1] for i in replace])
+        for i, ok in zip(replace, placed):
+            results[i] = ok
+        return results
+
+    async def handle_order_status(self, order, status):
+        """Interpret the exchange status of a single placed order, shrinking rejected reduce only orders"""
+        coin, size, price, reduce_only = order["coin"], order["sz"], order["limit_px"], order["reduce_only"]
+        if "error" in status:
+            if status["error"].startswith("Reduce only order would increase position") and reduce_only:
+                logger.info(f"Reduce only order would increase position for {size} {coin} @ ${price}, shrinking")
+                new_size = self.floor_to_decimals(size * 0.75, self.sz_decimals[coin])
+                min_size = 1 / (10 ** self.sz_decimals[coin])
+                if new_size < min_size or new_size * price < self.TRADE_LIMIT:
+                    logger.info(f"New size {new_size} is too small, skipping order")
+                    self.record_orders("place", "skipped_too_small")
+                    return False
+                return await self.place_limit_order(coin, order["is_buy"], new_size, price, reduce_only)
+            logger.error(f"Error in order response for {coin} {size} @ ${price}: {status['error']}")
+            self.record_orders("place", "rejected")
             return False
+        # Track it right away, a sync of its key before our websocket update arrives would place it again.
+        # An update of it processed already is at least as recent as the ack, whether it left the order open or closed it
+        oid = status.get("resting", {}).get("oid")
+        if oid is not None and self.my_orders.get_by_oid(oid) is None and oid not in self.closed_oids:
+            self.my_orders.upsert({
+                "coin": coin, "side": "B" if order["is_buy"] else "A", "limitPx": str(price), "sz": str(size),
+                "oid": oid, "reduceOnly": reduce_only,
+            })
+        order_type = 'buy' if order["is_buy"] else 'sell'
+        logger.info(f"Successfully placed {order_type} order for {size} {coin} @ ${price}")
+        self.record_orders("place", "placed")
+        return True
+
+    @staticmethod
+    def record_orders(action, outcome, count=1):
+        metrics.ORDERS.inc(count, bot="order_bot", action=action, outcome=outcome)
+
+    @staticmethod
+    def record_copy_latency(action):
+        """Observe leader update received to exchange ack, when acting on behalf of a websocket update"""
+        received_at = update_received_at.get()
+        if received_at is not None:
+            latency = time.monotonic() - received_at
+            metrics.COPY_LATENCY.observe(latency, bot="order_bot", action=action)
+            healthcheck.record_copy_lag(latency)
+
+    def queue_gauges(self):
+        gauges = {}
+        for account, workers in (("copy", self.copy_workers), ("my", self.my_workers)):
+            for stat, value in workers.queue_stats().items():
+                gauges[(("account", account), ("stat", stat))] = value
+        return gauges
 
     def print_order_summary(self, orders, title):
-        if not orders:
-            logger.info(f"\n{title}: No active orders")
-            return
-            
-        logger.info(f"\n{title}:")
-        order_summary = {}
+        """Log the orders placed, changed and gone since the last summary of title"""
+        summary = {}
         total_value = 0
-        
         for order in orders:
-            coin = order['coin']
-            if coin not in order_summary:
-                order_summary[coin] = []
-                
             order_value = float(order['sz']) * float(order['limitPx'])
             total_value += abs(order_value)
-            
-            order_summary[coin].append({
-                'side': 'Buy' if order['side'] == 'B' else 'Sell',
-                'price': float(order['limitPx']),
-                'size': float(order['sz']),
-                'value': order_value,
-                'reduceOnly': order.get('reduceOnly', False)
-            })
-            
-        # Print summary by coin
-        for coin, orders in order_summary.items():
-            logger.info(f"  {coin}: {len(orders)} orders")
-            for order in orders:
-                logger.info(f"    {order['side']} {order['size']} @ ${order['price']} (${abs(order['value']):.2f})")
-                
-        logger.info(f"  Total order value: ${total_value:.2f}")
+            side = 'Buy' if order['side'] == 'B' else 'Sell'
+            summary[order['oid']] = f"{order['coin']}: {side} {float(order['sz'])} @ ${float(order['limitPx'])} (${abs(order_value):.2f})"
+
+        previous = self.order_summaries.get(title)
+        if summary == previous:
+            return
+        self.order_summaries[title] = summary
+        if not summary:
+            logger.info(f"\n{title}: No active orders")
+            return
+        previous = previous or {}
+        lines = [f"  - {line}" for oid, line in previous.items() if summary.get(oid) != line]
+        lines += [f"  + {line}" for oid, line in summary.items() if previous.get(oid) != line]
+        # One record per summary, the lines are joined here rather than logged one by one
+        logger.info(f"\n{title}: {len(summary)} orders, total value ${total_value:.2f}\n" + "\n".join(lines))
 
     def handle_copy_account_order_update(self, order_msg):
         """Handle order updates from the account we're copying"""
@@ -198,17 +369,11 @@ class OrderBot:
                 if not all([coin, oid, side, limit_price, size]):
                     continue
                 
-                key = f"{coin}-{side}-{limit_price}"
-
-                if len(self.loop._ready) > 20:
-                    logger.warning("Too many orders pending, skipping...")
-                    return
+                key = OrderStore.key_of(order)
+                self.record_receive_lag(update, "copy")
                 
-                # Store the order and status for processing in the main event loop
-                asyncio.run_coroutine_threadsafe(
-                    self.process_copy_account_order(order, status, key),
-                    self.loop
-                )
+                # Queue the latest state of the order for processing by the coin's worker in the main event loop
+                self.copy_workers.put(coin, oid, (order, status, key))
         except Exception as e:
             logger.exception("Error in handle_copy_account_order_update")
             raise
@@ -218,27 +383,40 @@ class OrderBot:
         try:
             # Handle different order statuses
             if status == 'open':
-                # New or modified order
-                self.copy_account_orders[key] = order
-                await self.sync_order(order)
+                # New or modified order, of a coin possibly listed after we loaded the metadata
+                if await metadata.ensure(order['coin']):
+                    logger.warning(f"Skipping copy account order of unknown coin {order['coin']}")
+                    return
+                # An oid modified to another price leaves its previous key, which has to be followed as well
+                previous = self.copy_account_orders.get_by_oid(order['oid'])
+                record = self.copy_account_orders.upsert(order)
+                moved_from = previous.key if previous is not None and previous.key != record.key else None
+                if self.buckets is not None:
+                    dirty = self.dirty_buckets.setdefault(record.coin, set())
+                    dirty.add(self.buckets.update(record.key))
+                    if moved_from is not None:
+                        dirty.add(self.buckets.update(moved_from))
+                else:
+                    await self.sync_order(self.target_orders.get(record.key))
+                    if moved_from is not None:
+                        await self.follow_key(moved_from)
             elif status in ['canceled', 'rejected']:
                 # Order is no longer active
-                if key in self.copy_account_orders:
-                    del self.copy_account_orders[key]
-                    await self.cancel_my_matching_order(key)
+                record = self.copy_account_orders.remove_oid(order['oid'])
+                if record is not None:
+                    if self.buckets is not None:
+                        self.dirty_buckets.setdefault(record.coin, set()).add(self.buckets.update(record.key))
+                    else:
+                        await self.follow_key(record.key)
             elif status == 'filled':
                 if float(order['sz']) == 0:
                     # Order is fully filled
-                    if key in self.copy_account_orders:
-                        del self.copy_account_orders[key]
-            
-            # Periodically update account values (not on every order update)
-            current_time = datetime.datetime.now().timestamp()
-            if current_time - self.last_sync_time > 10*60:  # Update every 10 minutes
-                await self.update_account_values()
-                self.last_sync_time = current_time
+                    record = self.copy_account_orders.remove_oid(order['oid'])
+                    if record is not None and self.buckets is not None:
+                        self.dirty_buckets.setdefault(record.coin, set()).add(self.buckets.update(record.key))
         except Exception as e:
             logger.exception("Error processing copy account order")
+            self.tighten_reconciliation("error processing copy account order")
             raise
 
     def handle_my_order_update(self, order_msg):
@@ -263,206 +441,560 @@ class OrderBot:
                 if not all([coin, oid, side, limit_price]):
                     continue
                 
-                key = f"{coin}-{side}-{limit_price}"
+                key = OrderStore.key_of(order)
+                self.record_receive_lag(update, "my")
                 
-                # Store the order and status for processing in the main event loop
-                asyncio.run_coroutine_threadsafe(
-                    self.process_my_order(order, status, key),
-                    self.loop
-                )
+                # Queue the latest state of the order for processing by the coin's worker in the main event loop
+                self.my_workers.put(coin, oid, (order, status, key))
         except Exception:
             logger.exception("Error in handle_my_order_update")
 
+    @staticmethod
+    def record_receive_lag(update, account):
+        status_timestamp = update.get('statusTimestamp')
+        if status_timestamp:
+            metrics.WS_RECEIVE_LAG.observe(max(time.time() - status_timestamp / 1000, 0), feed="orderUpdates", account=account)
+
+    async def resync_after_overflow(self):
+        """Dropped websocket updates can only be recovered from a snapshot"""
+        await self.snapshot_sync(initial=False)
+
+    async def resync_after_reconnect(self, account):
+        """Updates of account ("copy" or "my") sent while its websocket was down are lost, resync only its book"""
+        self.tighten_reconciliation(f"{account} websocket reconnected")
+        await self.snapshot_sync(initial=False, accounts=(account,))
+
     async def process_my_order(self, order, status, key):
         """Process order updates from our trading account in the main event loop"""
         try:
             # Update our order tracking
             if status == 'open':
-                self.my_orders[key] = order
+                if await metadata.ensure(order['coin']):
+                    logger.warning(f"Skipping our order of unknown coin {order['coin']}")
+                    return
+                self.my_orders.upsert(order)
             elif status in ['canceled', 'rejected']:
-                if key in self.my_orders:
-                    del self.my_orders[key]
+                self.close_my_order(order['oid'])
             elif status == 'filled':
                 logger.info(f'Filled order: {order["coin"]} {order["side"]} {float(order["origSz"])-float(order["sz"])}@{order["limitPx"]} (size so far)')
                 if float(order['sz']) == 0:
                     # Order is fully filled
-                    if key in self.my_orders:
-                        del self.my_orders[key]
+                    self.close_my_order(order['oid'])
+                elif self.my_orders.get_by_oid(order['oid']) is not None:
+                    # Track the size left, the book digests compare it with the exchange's
+                    self.my_orders.upsert(order)
         except Exception:
             logger.exception("Error processing my order")
+            self.tighten_reconciliation("error processing my order")
+
+    def close_my_order(self, oid, max_closed=1000):
+        self.my_orders.remove_oid(oid)
+        self.closed_oids[oid] = None
+        if len(self.closed_oids) > max_closed:
+            self.closed_oids.popitem(last=False)
+
+    def scale_lots(self, copy_order):
+        """Scale the order size in lots based on account values and leverage"""
+        scaled_lots = copy_order.sz * self.my_account_value / self.copy_account_value
+        # Floor, but if its like 2.9999 lots make it 3
+        return math.floor(round(scaled_lots, 1))
+
+    @staticmethod
+    def size_drifted(existing_order, scaled_lots):
+        return abs(existing_order.sz - scaled_lots) > existing_order.sz * 0.01  # 1% threshold for size difference
+
+    def build_follower_order(self, copy_order, verbose=True):
+        """Scale an order from the copy account to our account, returns None if it is too small to place"""
+        if self.copy_account_value == 0:
+            if verbose:
+                logger.warning(f"Copy account value unknown, skipping order for {copy_order.coin}")
+            return None
+
+        coin = copy_order.coin
+        limit_price = copy_order.price
+        scaled_lots = self.scale_lots(copy_order)
+        scaled_size = scaled_lots / 10 ** copy_order.sz_decimals
+        scaled_nominal = scaled_size * limit_price
+
+        # Ensure minimum order size
+        if scaled_lots < 1 or scaled_nominal < self.TRADE_LIMIT:
+            if verbose and copy_order.key not in self.skipped_keys:
+                self.skipped_keys.add(copy_order.key)
+                if scaled_lots < 1:
+                    logger.info(f"Skipping order for {coin} @ ${limit_price}: Order size {scaled_size} too small")
+                else:
+                    logger.info(f"Skipping order for {coin} @ ${limit_price}: Order nominal {scaled_nominal} too small")
+                self.record_orders("place", "skipped_too_small")
+            return None
+        if verbose:
+            self.skipped_keys.discard(copy_order.key)
+
+        return {
+            "coin": coin,
+            "is_buy": copy_order.is_buy,
+            "sz": scaled_size,
+            "limit_px": limit_price,
+            "reduce_only": copy_order.reduce_only,
+        }
 
     async def sync_order(self, copy_order):
         """Sync a single order from the copy account to our account"""
         try:
-            # Wait for account values to be initialized
+            # Account values are kept current by the stream and the sync loop, an order event never fetches them
             if self.copy_account_value == 0 or self.my_account_value == 0:
-                await self.update_account_values()
+                logger.warning(f"Account values unknown, skipping order for {copy_order.coin}")
+                return
                 
-            coin = copy_order['coin']
-            side = copy_order['side']
-            limit_price = float(copy_order['limitPx'])
-            order_size = float(copy_order['sz'])
-            reduce_only = copy_order.get('reduceOnly', False)
-            
-            key = f"{coin}-{side}-{limit_price}"
-            existing_order = self.my_orders.get(key, None)
-            
-            # Scale the order size based on account values and leverage
-            scaled_size = (order_size * self.my_account_value) / self.copy_account_value
-            scaled_size = self.floor_to_decimals(scaled_size, self.sz_decimals[coin])
-            scaled_nominal = scaled_size * limit_price
-            min_size = 1 / (10 ** self.sz_decimals[coin])
+            existing_order = self.my_orders.get(copy_order.key)
             
             # Check if we need to place a new order
             if not existing_order:
-                # Ensure minimum order size
-                if scaled_size < min_size:
-                    logger.info(f"Skipping order for {coin} @ ${limit_price}: Order size {scaled_size} too small")
-                    return
-                if scaled_nominal < self.TRADE_LIMIT:
-                    logger.info(f"Skipping order for {coin} @ ${limit_price}: Order nominal {scaled_nominal} too small")
+                follower_order = self.build_follower_order(copy_order)
+                if follower_order is None:
                     return
 
-                logger.info(f"Syncing order for {coin} {side} {scaled_size}@${limit_price}")
-                await self.place_limit_order(
-                    coin,
-                    side == 'B',  # True for buy, False for sell
-                    scaled_size,
-                    limit_price,
-                    reduce_only=reduce_only
-                )
-            else:
-                # Check if we need to update the order size
-                current_size = float(existing_order['sz'])
-                size_diff = abs(current_size - scaled_size)
-                
-                if size_diff / current_size > 0.01:  # 1% threshold for size difference
-                    # Cancel and replace the order
-                    if await self.cancel_order(coin, existing_order['oid']):
-                        await self.place_limit_order(
-                            coin,
-                            side == 'B',
-                            scaled_size,
-                            limit_price,
-                            reduce_only=reduce_only
-                        )
+                logger.info(f"Syncing order for {copy_order.coin} {copy_order.side} {follower_order['sz']}@${copy_order.price}")
+                await self.bulk_place_limit_orders([follower_order])
+            elif self.size_drifted(existing_order, self.scale_lots(copy_order)):
+                follower_order = self.build_follower_order(copy_order)
+                if follower_order is None:
+                    await self.cancel_order(existing_order.coin, existing_order.oid)
+                else:
+                    await self.resize_orders([(existing_order.oid, follower_order)])
             
         except Exception:
             logger.exception("Error syncing order")
+            self.tighten_reconciliation("error syncing order")
+
+    async def sync_buckets(self, coin):
+        """Follow the price buckets of coin changed by the batch of updates just processed, one action of each kind"""
+        dirty = self.dirty_buckets.pop(coin, ())
+        if not dirty:
+            return
+        if self.copy_account_value == 0 or self.my_account_value == 0:
+            logger.warning(f"Account values unknown, skipping {len(dirty)} price buckets of {coin}")
+            return
+        cancels = []
+        new_orders = []
+        resized_orders = []
+        for key in dirty:
+            target = self.buckets.get(key)
+            follower_order = self.build_follower_order(target) if target is not None else None
+            existing_order = self.my_orders.get(key)
+            if existing_order is None:
+                if follower_order is not None:
+                    logger.info(f"Syncing price bucket {coin} {target.side} {follower_order['sz']}@${target.price}")
+                    new_orders.append(follower_order)
+            elif follower_order is None:
+                cancels.append((existing_order.coin, existing_order.oid))
+            elif self.size_drifted(existing_order, self.scale_lots(target)):
+                resized_orders.append((existing_order.oid, follower_order))
+        await asyncio.gather(
+            self.bulk_cancel_orders(cancels),
+            self.bulk_place_limit_orders(new_orders),
+            self.resize_orders(resized_orders),
+        )
+
+    async def follow_key(self, key):
+        """Bring our order at key in line with the copy account's orders left there after one of them left the key"""
+        if key in self.copy_account_orders:
+            await self.sync_order(self.target_orders.get(key))
+        else:
+            await self.cancel_my_matching_order(key)
 
     async def cancel_my_matching_order(self, key):
         """Cancel our order that matches a key from the copy account"""
         try:
-            if key in self.my_orders:
-                order = self.my_orders[key]
-                await self.cancel_order(order['coin'], order['oid'])
+            order = self.my_orders.get(key)
+            if order is not None:
+                await self.cancel_order(order.coin, order.oid)
         except Exception as e:
             logger.error(f"Error cancelling matching order: {str(e)}", exc_info=True)
 
+    def handle_account_state(self, msg):
+        """Handle webData2 user state of either account (called from the websocket thread)"""
+        try:
+            data = msg.get("data", {})
+            state = data.get("clearinghouseState")
+            if not state:
+                return
+            account = "copy" if data.get("user", "").lower() == self.ACCOUNT_TO_COPY.lower() else "my"
+            value = float(state["crossMarginSummary"]["accountValue"])
+            self.loop.call_soon_threadsafe(self.set_account_value, account, value)
+        except Exception:
+            logger.exception("Error in handle_account_state")
+
+    def set_account_value(self, account, value):
+        if account == "copy":
+            self.copy_account_value = value
+        else:
+            self.my_account_value = value * self.LEVERAGE
+        self.account_value_at[account] = time.monotonic()
+
+    async def refresh_account_values(self):
+        """Fetch over REST the account values not streamed within ACCOUNT_VALUE_MAX_AGE"""
+        now = time.monotonic()
+        addresses = {"copy": self.ACCOUNT_TO_COPY, "my": self.TRADING_ADDRESS}
+        stale = [account for account in addresses if now - self.account_value_at[account] > self.ACCOUNT_VALUE_MAX_AGE]
+        if not stale:
+            return
+        if all(at > float("-inf") for at in self.account_value_at.values()):
+            logger.info(f"Account value stream quiet for {', '.join(stale)} account, fetching over REST")
+        values = await asyncio.gather(*(self.get_account_value(addresses[account]) for account in stale))
+        # Keep the last known values when a fetch failed or was shed by the rate limiter
+        for account, value in zip(stale, values):
+            if value is not None:
+                self.set_account_value(account, value)
+
     async def update_account_values(self):
-        """Update account values for both accounts"""
+        """Bring account values up to date for both accounts and log them with the bot's stats"""
         try:
-            self.copy_account_value = await self.get_account_value(self.ACCOUNT_TO_COPY)
-            raw_my_account_value = await self.get_account_value(self.TRADING_ADDRESS)
-            self.my_account_value = raw_my_account_value * self.LEVERAGE
+            await self.refresh_account_values()
             
             logger.info(f"Account values updated: Copy account: ${self.copy_account_value:,.2f}. My account (with {self.LEVERAGE}x leverage): ${self.my_account_value:,.2f}")
+            logger.info(f"Info connection stats: {info_client.connection_stats()}")
+            logger.info(f"Rate limit budget: {rate_limiter.usage()}")
+            logger.info(f"Event queues: copy account {self.copy_workers.queue_stats()}, my account {self.my_workers.queue_stats()}")
+            logger.info(f"Copy account queue latency per coin: {self.copy_workers.latency_stats()}")
         except Exception:
             logger.exception("Error updating account values")
 
-    async def snapshot_sync(self, initial):
-        """Perform initial synchronization of orders"""
+    async def snapshot_sync(self, initial, accounts=("copy", "my")):
+        """Replace the tracked books of accounts with snapshots and bring our orders in line with the copy account
+
+        A resync of a single account trusts the other account's book as tracked and keeps the account values.
+        """
+        async with self.sync_lock, contextlib.AsyncExitStack() as coin_locks:
+            # Keep the coin workers from acting on updates between the snapshot and the orders placed from it,
+            # an order one of them places meanwhile would be missing from the snapshot and placed again
+            for coin in sorted(set(self.sz_decimals) | set(self.copy_workers.workers) | set(self.my_workers.workers)):
+                await coin_locks.enter_async_context(self.copy_workers.lock(coin))
+                await coin_locks.enter_async_context(self.my_workers.lock(coin))
+            await self._snapshot_sync(initial, accounts)
+
+    async def _snapshot_sync(self, initial, accounts):
         try:
-            # Update account values
-            await self.update_account_values()
-            
-            # Get initial orders
-            copy_orders = await self.get_open_orders(self.ACCOUNT_TO_COPY)
-            my_orders = await self.get_open_orders(self.TRADING_ADDRESS)
-            
-            # Store orders in our tracking dictionaries
-            for order in copy_orders:
-                key = f"{order['coin']}-{order['side']}-{order['limitPx']}"
-                self.copy_account_orders[key] = order
-                
-            for order in my_orders:
-                key = f"{order['coin']}-{order['side']}-{order['limitPx']}"
-                self.my_orders[key] = order
+            cycle_start = time.perf_counter()
+            full = len(accounts) == 2
 
-            if len(copy_orders) != len(my_orders) or initial:
+            # Update account values and get the orders of the accounts concurrently
+            addresses = {"copy": self.ACCOUNT_TO_COPY, "my": self.TRADING_ADDRESS}
+            _, *snapshots = await asyncio.gather(
+                self.update_account_values() if full else asyncio.sleep(0),
+                *(self.get_open_orders(addresses[account]) for account in accounts),
+            )
+            fetched = time.perf_counter()
+            if any(orders is None for orders in snapshots):
+                logger.warning("Skipping snapshot sync, failed to fetch open orders")
+                self.tighten_reconciliation("failed to fetch open orders")
+                return
+            # Orders of coins we have no metadata for (spot, new listings the refresh did not bring) can't be copied
+            unknown = await metadata.ensure(*{order['coin'] for orders in snapshots for order in orders})
+            if unknown != self.unknown_coins:
+                if unknown:
+                    logger.warning(f"Ignoring orders of coins missing from the metadata: {', '.join(sorted(unknown))}")
+                self.unknown_coins = unknown
+            if unknown:
+                snapshots = [[order for order in orders if order['coin'] not in unknown] for orders in snapshots]
+            
+            # Replace our tracked orders, the snapshot also drops orders whose updates we missed
+            stores = {"copy": self.copy_account_orders, "my": self.my_orders}
+            titles = {"copy": "Copy Account Orders", "my": "My Orders"}
+            if initial:
+                logger.info("Initial sync started")
+            for account, orders in zip(accounts, snapshots):
+                stores[account].replace_all(orders)
+                # Log the order changes since the last sync
+                self.print_order_summary(orders, titles[account])
+            if self.buckets is not None:
+                self.buckets.rebuild()
                 if initial:
-                    logger.info("Initial sync started")
-                # Print initial order summary
-                self.print_order_summary(copy_orders, "Copy Account Orders")
-                self.print_order_summary(my_orders, "My Orders")
+                    logger.info(f"Merged {len(self.copy_account_orders)} copy account orders into {len(self.buckets)} price buckets")
+            # Forget skipped orders the copy account no longer has
+            self.skipped_keys.intersection_update(self.target_orders)
             
-            # Cancel orders that don't match the copy account
+            # Cancel orders that don't match the copy account, and all but one of ours at a price
+            stale_orders = [order for order in self.my_orders.values() if order.key not in self.target_orders]
+            stale_orders += [order for order in self.my_orders.duplicates() if order.key in self.target_orders]
+
+            # Place orders that are in the copy account but not in ours, resize the ones that drifted and
+            # cancel the ones whose copy order shrank below the minimum size. Without both account values
+            # no order can be sized, so the ones matching the copy account are left alone
+            new_orders = []
+            resized_orders = []
+            targets = list(self.target_orders.items())
+            if self.copy_account_value == 0 or self.my_account_value == 0:
+                logger.warning("Account values unknown, only cancelling orders the copy account does not have")
+                self.tighten_reconciliation("account values unknown")
+                targets = []
+            for key, order in targets:
+                follower_order = self.build_follower_order(order)
+                existing_order = self.my_orders.get(key)
+                if existing_order is None:
+                    if follower_order is not None:
+                        new_orders.append(follower_order)
+                elif follower_order is None:
+                    stale_orders.append(existing_order)
+                elif self.size_drifted(existing_order, self.scale_lots(order)):
+                    resized_orders.append((existing_order.oid, follower_order))
+
+            results = await self.bulk_cancel_orders([(order.coin, order.oid) for order in stale_orders])
             cancelled_count = 0
-            for key, order in list(self.my_orders.items()):
-                if key not in self.copy_account_orders:
-                    if await self.cancel_order(order['coin'], order['oid']):
-                        cancelled_count += 1
-                        del self.my_orders[key]
-            
-            # Place orders that are in the copy account but not in ours
-            placed_count = 0
-            for key, order in self.copy_account_orders.items():
-                if key not in self.my_orders:
-                    await self.sync_order(order)
-                    placed_count += 1
+            for order, cancelled in zip(stale_orders, results):
+                if cancelled:
+                    cancelled_count += 1
+                    self.my_orders.remove_oid(order.oid)
+            placed_count = sum(await self.bulk_place_limit_orders(new_orders))
+            resized_count = sum(await self.resize_orders(resized_orders)) if resized_orders else 0
+            cycle_end = time.perf_counter()
+
+            self.cycle_timings = {
+                "fetch_ms": (fetched - cycle_start) * 1000,
+                "orders_ms": (cycle_end - fetched) * 1000,
+                "total_ms": (cycle_end - cycle_start) * 1000,
+            }
+            logger.debug(f"Snapshot sync timings: {self.cycle_timings}")
+            metrics.CYCLE_SECONDS.observe(cycle_end - cycle_start, bot="order_bot")
+
+            if cancelled_count or placed_count or resized_count:
+                logger.info(f"Snapshot sync cancelled {cancelled_count}/{len(stale_orders)}, placed {placed_count}/{len(new_orders)} and resized {resized_count}/{len(resized_orders)} orders")
             
-            self.last_sync_time = datetime.datetime.now().timestamp()
+            if full:
+                self.last_full_sync = time.monotonic()
+                self.divergent_checks = 0
             
         except Exception as e:
             logger.error(f"Error in initial sync: {str(e)}", exc_info=True)
 
+    async def book_digests(self):
+        """Digests of the book we expect and the one we have, from one fetch of our open orders, None if it failed
+
+        Each digest covers the keys of the book, one order per placeable copy order, and our orders' oid, key and
+        size as tracked and as on the exchange, so missing, extra and resized orders and missed updates all show.
+        """
+        orders = await self.get_open_orders(self.TRADING_ADDRESS)
+        if orders is None:
+            return None
+        # Orders of coins without metadata are left out of the tracked books as well
+        orders = [order for order in orders if order['coin'] in self.sz_decimals]
+        expected_keys = sorted(
+            key for key, order in list(self.target_orders.items())
+            if self.build_follower_order(order, verbose=False) is not None
+        )
+        tracked = frozenset((order.oid, order.key, order.sz) for order in self.my_orders.values())
+        actual_keys = sorted(OrderStore.key_of(order) for order in orders)
+        actual = frozenset(
+            (order['oid'], OrderStore.key_of(order), to_lots(order['sz'], self.sz_decimals[order['coin']]))
+            for order in orders
+        )
+        return hash((tuple(expected_keys), tracked)), hash((tuple(actual_keys), actual))
+
+    def tighten_reconciliation(self, reason):
+        """Check the books again soon, after errors, reconnects or divergence"""
+        if self.reconcile_interval != self.SLEEP_INTERVAL:
+            logger.info(f"Tightening reconciliation interval to {self.SLEEP_INTERVAL}s: {reason}")
+        self.reconcile_interval = self.SLEEP_INTERVAL
+
+    async def reconcile(self):
+        """Compare book digests and run a full snapshot_sync only if they keep diverging or a periodic one is due"""
+        try:
+            # Orders no full sync confirmed for several intervals can't be trusted anymore
+            max_age = 3 * self.FULL_SYNC_INTERVAL
+            evicted = self.copy_account_orders.evict_stale(max_age) + self.my_orders.evict_stale(max_age)
+            if evicted:
+                logger.warning(f"Evicted {evicted} stale tracked orders")
+                if self.buckets is not None:
+                    self.buckets.rebuild()
+
+            if self.copy_account_value == 0 or self.my_account_value == 0:
+                # No copy order can be sized yet, every one of them would look missing from our book
+                self.tighten_reconciliation("account values unknown")
+                return
+            digests = await self.book_digests()
+            if digests is None:
+                self.tighten_reconciliation("failed to fetch open orders")
+                return
+            expected, actual = digests
+            if expected != actual:
+                self.divergent_checks += 1
+                # Our own order updates trail the copy account's, give them one interval to arrive
+                if self.divergent_checks < 2:
+                    self.tighten_reconciliation("books diverged")
+                    return
+                logger.info("Books diverged, running full sync")
+            elif time.monotonic() - self.last_full_sync < self.FULL_SYNC_INTERVAL:
+                self.divergent_checks = 0
+                self.reconcile_interval = min(self.reconcile_interval * 2, self.MAX_RECONCILE_INTERVAL)
+                return
+
+            await self.snapshot_sync(initial=False)
+        except Exception:
+            logger.exception("Error reconciling books")
+            self.tighten_reconciliation("error reconciling books")
+
+    def checkpoint_state(self):
+        """Tracked books and account values of both accounts, in the form restore_checkpoint() takes"""
+        return {
+            "saved_at": time.time(),
+            "account_to_copy": self.ACCOUNT_TO_COPY,
+            "trading_address": self.TRADING_ADDRESS,
+            "copy_account_value": self.copy_account_value,
+            "my_account_value": self.my_account_value,
+            "copy_orders": [order.to_order() for order in self.copy_account_orders.values()],
+            "my_orders": [order.to_order() for order in self.my_orders.values()],
+        }
+
+    async def save_checkpoint(self):
+        """Write the tracked state for a warm restart, the books are captured on the loop and written off it"""
+        state = self.checkpoint_state()
+        self.last_checkpoint = time.monotonic()
+        try:
+            await asyncio.to_thread(write_json, self.checkpoint_path, state)
+        except OSError:
+            logger.exception(f"Failed to write checkpoint {self.checkpoint_path}")
+
+    def restore_checkpoint(self):
+        """Load the books and account values of a recent checkpoint of the same accounts, returns whether it did"""
+        try:
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            logger.info("No checkpoint, starting cold")
+            return False
+        except (OSError, ValueError):
+            logger.exception(f"Unreadable checkpoint {self.checkpoint_path}, starting cold")
+            return False
+        age = time.time() - state.get("saved_at", 0)
+        if state.get("account_to_copy") != self.ACCOUNT_TO_COPY or state.get("trading_address") != self.TRADING_ADDRESS:
+            logger.info("Checkpoint is of other accounts, starting cold")
+            return False
+        if age > self.CHECKPOINT_MAX_AGE:
+            logger.info(f"Checkpoint is {age:.0f}s old, starting cold")
+            return False
+        self.copy_account_orders.replace_all(order for order in state["copy_orders"] if order["coin"] in self.sz_decimals)
+        self.my_orders.replace_all(order for order in state["my_orders"] if order["coin"] in self.sz_decimals)
+        if self.buckets is not None:
+            self.buckets.rebuild()
+        self.copy_account_value = state["copy_account_value"]
+        self.my_account_value = state["my_account_value"]
+        # The values are as old as the checkpoint, validation fetches the ones older than ACCOUNT_VALUE_MAX_AGE
+        saved_at = time.monotonic() - age
+        self.account_value_at = {"copy": saved_at, "my": saved_at}
+        logger.info(
+            f"Restored checkpoint from {age:.0f}s ago: {len(self.copy_account_orders)} copy account "
+            f"and {len(self.my_orders)} own orders"
+        )
+        return True
+
+    async def validate_checkpoint(self):
+        """Check the restored books against one concurrent fetch of both books, orders that still match stay untouched
+
+        The leader may have moved while we were down, so its book is fetched as well, along with the account values
+        the checkpoint holds too old to size orders with.
+        """
+        restored = {order.oid for order in self.my_orders.values()}
+        await self.snapshot_sync(initial=False)
+        kept = restored & {order.oid for order in self.my_orders.values()}
+        logger.info(f"Warm restart kept {len(kept)}/{len(restored)} of our checkpointed orders")
+
     async def cancel_all_orders(self):
-        """Cancel all open orders for the trading account"""
+        """Cancel all open orders for the trading account, returns whether every cancel succeeded"""
         logger.info("Cancelling all open orders...")
-        orders = await self.get_open_orders(self.TRADING_ADDRESS)
-        logger.info(f"Found {len(orders)} open orders")
-        cancelled = 0
-        failed = 0
-        
-        for order in orders:
-            try:
-                coin = order.get('coin')
-                oid = order.get('oid')
-                
-                if await self.cancel_order(coin, oid):
-                    cancelled += 1
-                else:
-                    failed += 1
-                    logger.error(f"Failed to cancel order {oid}")
-            except Exception as e:
-                failed += 1
-                logger.error(f"Error cancelling order: {str(e)}", exc_info=True)
+        # Tracked orders are cancelled right away, the open orders fetched meanwhile catch any we don't track
+        tracked = [(order.coin, order.oid) for order in self.my_orders.values()]
+        fetch = asyncio.create_task(self.get_open_orders(self.TRADING_ADDRESS))
+        results = await self.cancel_by_coin(tracked)
+        orders = await fetch
+        if orders is None:
+            logger.warning("Failed to fetch open orders, cancelled only the tracked ones")
+        tracked_oids = {oid for _, oid in tracked}
+        untracked = [(order['coin'], order['oid']) for order in orders or [] if order['oid'] not in tracked_oids]
+        logger.info(f"Found {len(tracked)} tracked and {len(untracked)} untracked open orders")
+        results += await self.cancel_by_coin(untracked)
+        cancelled = sum(results)
+        failed = len(results) - cancelled
         
         logger.info(f"Successfully cancelled: {cancelled}")
         logger.info(f"Failed to cancel: {failed}")
+        return failed == 0 and orders is not None
+
+    async def cancel_by_coin(self, cancels):
+        """Cancel (coin, oid) pairs with concurrent bulk cancels, each covering whole coins unless a coin fills several"""
+        by_coin = {}
+        for coin, oid in cancels:
+            by_coin.setdefault(coin, []).append((coin, oid))
+        batches = [[]]
+        for coin_cancels in by_coin.values():
+            if batches[-1] and len(batches[-1]) + len(coin_cancels) > self.BULK_CHUNK_SIZE:
+                batches.append([])
+            batches[-1].extend(coin_cancels)
+        chunk_results = await asyncio.gather(*[
+            self.cancel_chunk(chunk) for batch in batches for chunk in self.chunked(batch, self.BULK_CHUNK_SIZE)
+        ])
+        return [result for results in chunk_results for result in results]
+
+    async def schedule_cancel(self, at):
+        """Have the exchange cancel all our orders at unix time at, None unschedules, returns whether it was accepted"""
+        try:
+            result = await self.exchange_client.call("schedule_cancel", None if at is None else int(at * 1000))
+        except Exception:
+            logger.exception("Exception scheduling the cancel of all orders")
+            return False
+        if result["status"] != "ok":
+            logger.error(f"Failed to schedule the cancel of all orders: {result}")
+            return False
+        return True
+
+    async def renew_dead_man_switch(self):
+        """Keep the exchange's scheduled cancel of all our orders DEAD_MAN_SWITCH seconds ahead while the bot is healthy
+
+        A bot that is killed, stalls or loses its websockets stops renewing and the exchange cancels its orders.
+        The exchange triggers a scheduled cancel at most 10 times a day.
+        """
+        while True:
+            live, _ = healthcheck.check(readiness=False)
+            if live and all(supervisor.connected() for supervisor in self.supervisors.values()):
+                await self.schedule_cancel(time.time() + self.DEAD_MAN_SWITCH)
+            else:
+                logger.warning("Bot is unhealthy, not renewing the dead man's switch")
+            await asyncio.sleep(self.DEAD_MAN_SWITCH / 3)
 
     async def shutdown(self):
         """Clean shutdown of the bot"""
+        started = time.monotonic()
         logger.info("\nInitiating shutdown sequence...")
         
-        # Cancel all open orders
-        await self.cancel_all_orders()
+        self.copy_workers.stop()
+        self.my_workers.stop()
+        for task in self.supervisor_tasks:
+            task.cancel()
+        if self.dead_man_task is not None:
+            self.dead_man_task.cancel()
+
+        if self.WARM_RESTART:
+            # Leave our orders on the book, the next start resumes from this checkpoint. A scheduled cancel stays
+            # armed and wipes them if the bot doesn't come back within DEAD_MAN_SWITCH seconds
+            await self.save_checkpoint()
+            logger.info(f"Warm restart enabled, leaving {len(self.my_orders)} orders on the book")
+        elif await self.cancel_all_orders() and self.dead_man_task is not None:
+            # Nothing left to cancel, don't spend one of the daily triggers on an empty book
+            await self.schedule_cancel(None)
+        logger.info(f"Orders handled {time.monotonic() - started:.2f}s after the shutdown started")
         
         # Disconnect WebSockets
         logger.info("Disconnecting WebSockets...")
-        self.info.disconnect_websocket()
-        self.info2.disconnect_websocket()
+        await asyncio.gather(*[supervisor.close() for supervisor in self.supervisors.values()])
         
-        # Ensure all pending tasks are completed
-        if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=True)
+        # Ensure all pending exchange actions are completed
+        self.exchange_client.shutdown(wait=True)
+        journal.stop()
         
         # Ensure Sentry events are sent
         # client = sentry_sdk.Hub.current.client
         # if client is not None:
         #     client.flush(timeout=2.0)
             
-        logger.info("Shutdown complete")
+        logger.info(f"Shutdown complete in {time.monotonic() - started:.2f}s")
 
     async def run(self):
         logger.info("Starting order copy bot...")
@@ -471,26 +1003,45 @@ class OrderBot:
         logger.info(f"Leverage: {self.LEVERAGE}x")
         
         try:
-            # Perform initial synchronization
-            await self.snapshot_sync(initial = True)
+            # A warm restart resumes from the checkpoint and validates it once subscribed, so no update is missed
+            warm = self.WARM_RESTART and self.restore_checkpoint()
+            if not warm:
+                # Perform initial synchronization
+                await self.snapshot_sync(initial = True)
             
             # Subscribe to order updates for both accounts
             logger.info("Setting up WebSocket subscriptions...")
-            self.info.subscribe(
+            self.supervisors["copy"].subscribe(
                 {"type": "orderUpdates", "user": self.ACCOUNT_TO_COPY}, 
-                self.handle_copy_account_order_update
+                journal.recorded("orderUpdates:copy", self.handle_copy_account_order_update)
             )
-            self.info2.subscribe(
+            self.supervisors["my"].subscribe(
                 {"type": "orderUpdates", "user": self.TRADING_ADDRESS}, 
-                self.handle_my_order_update
+                journal.recorded("orderUpdates:my", self.handle_my_order_update)
+            )
+            self.supervisors["copy"].subscribe(
+                {"type": "webData2", "user": self.ACCOUNT_TO_COPY}, journal.recorded("webData2", self.handle_account_state)
+            )
+            self.supervisors["my"].subscribe(
+                {"type": "webData2", "user": self.TRADING_ADDRESS}, journal.recorded("webData2", self.handle_account_state)
             )
+            self.supervisor_tasks = [asyncio.create_task(supervisor.run()) for supervisor in self.supervisors.values()]
             
             logger.info("WebSocket subscriptions active, now processing real-time updates")
+            if warm:
+                await self.validate_checkpoint()
+            if self.DEAD_MAN_SWITCH:
+                self.dead_man_task = asyncio.create_task(self.renew_dead_man_switch())
             
-            # Keep the main task alive
+            # Websocket events keep the books current, periodically verify them and resync only on divergence
+            healthcheck.watch("sync", max(healthcheck.SYNC_STALE_SECONDS, 3 * self.MAX_RECONCILE_INTERVAL), liveness=True)
             while True:
-                await asyncio.sleep(self.SLEEP_INTERVAL)  # Just keep the main task alive
-                await self.snapshot_sync(initial = False)
+                healthcheck.heartbeat("sync")
+                await asyncio.sleep(self.reconcile_interval)
+                await self.reconcile()
+                await self.refresh_account_values()
+                if self.WARM_RESTART and time.monotonic() - self.last_checkpoint >= self.CHECKPOINT_INTERVAL:
+                    await self.save_checkpoint()
                 
         except asyncio.CancelledError:
             logger.info("Bot operation cancelled")
@@ -499,6 +1050,11 @@ class OrderBot:
         finally:
             await self.shutdown()
 
+    @staticmethod
+    def chunked(items, size):
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+
     @staticmethod
     def floor_to_decimals(value, decimals):
         ''' Floor value, but if its like 0.29999 make it 0.3 '''
@@ -507,6 +1063,9 @@ class OrderBot:
         return math.floor(value * factor) / factor
 
 async def main():
+    journal.start("order_bot", {"account_to_copy": os.getenv("ACCOUNT_TO_COPY"), "trading_address": os.getenv("TRADING_ADDRESS")})
+    # docker stop sends SIGTERM, cancel the bot so that its shutdown runs within the stop grace period
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
     bot = OrderBot()
     try:
         await bot.run()
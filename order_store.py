@@ -0,0 +1,259 @@
+import math
+import time
+from metadata import metadata
+
+PX_SCALE = 10 ** 8  # prices are held as integer ticks of 1e-8, the finest price the exchange accepts on the wire
+
+def to_ticks(px):
+    return round(float(px) * PX_SCALE)
+
+def to_lots(sz, sz_decimals):
+    return round(float(sz) * 10 ** sz_decimals)
+
+class OrderRecord:
+    """Open order with its price in integer ticks and sizes in integer lots of the coin's szDecimals"""
+    __slots__ = ("coin", "side", "px", "sz", "orig_sz", "oid", "reduce_only", "sz_decimals", "updated_at")
+
+    def __init__(self, coin, side, px, sz, orig_sz, oid, reduce_only, sz_decimals):
+        self.coin = coin
+        self.side = side  # 'B' for buy, 'A' for sell
+        self.px = px
+        self.sz = sz
+        self.orig_sz = orig_sz
+        self.oid = oid
+        self.reduce_only = reduce_only
+        self.sz_decimals = sz_decimals
+        self.updated_at = time.monotonic()
+
+    @property
+    def key(self):
+        return (self.coin, self.side, self.px)
+
+    @property
+    def price(self):
+        return self.px / PX_SCALE
+
+    @property
+    def size(self):
+        return self.sz / 10 ** self.sz_decimals
+
+    @property
+    def is_buy(self):
+        return self.side == 'B'
+
+    def to_order(self):
+        """The raw websocket/REST form upsert() takes, for checkpoints"""
+        return {
+            'coin': self.coin,
+            'side': self.side,
+            'limitPx': str(self.price),
+            'sz': str(self.size),
+            'origSz': str(self.orig_sz / 10 ** self.sz_decimals),
+            'oid': self.oid,
+            'reduceOnly': self.reduce_only,
+        }
+
+def merge(key, records):
+    """One order at key for the summed sizes of records, e.g. all orders at a price"""
+    coin, side, px = key
+    return OrderRecord(
+        coin,
+        side,
+        px,
+        sum(record.sz for record in records),
+        sum(record.orig_sz for record in records),
+        None,
+        # Merging in orders that may open a position can't be placed reduce-only
+        all(record.reduce_only for record in records),
+        records[0].sz_decimals,
+    )
+
+class OrderStore:
+    """Open orders of one account by oid, indexed by (coin, side, price ticks)
+
+    Several orders can rest at one key, get() and items() serve the oldest of them, values() and len() all orders.
+    """
+
+    def __init__(self, sz_decimals, max_orders=5000):
+        self.sz_decimals = sz_decimals  # coin -> szDecimals, shared with the bot
+        self.max_orders = max_orders
+        self.by_oid = {}
+        self.by_key = {}  # key -> {oid: record}, oldest first
+
+    @staticmethod
+    def key_of(order):
+        """Key of a raw websocket/REST order, equal for "100" and "100.0" prices"""
+        return (order['coin'], order['side'], to_ticks(order['limitPx']))
+
+    def upsert(self, order):
+        """Store a raw websocket/REST order, replacing the previous state of its oid, e.g. at another price"""
+        sz_decimals = self.sz_decimals[order['coin']]
+        record = OrderRecord(
+            order['coin'],
+            order['side'],
+            to_ticks(order['limitPx']),
+            to_lots(order['sz'], sz_decimals),
+            to_lots(order.get('origSz', order['sz']), sz_decimals),
+            order['oid'],
+            order.get('reduceOnly', False),
+            sz_decimals,
+        )
+        previous = self.by_oid.get(record.oid)
+        if previous is not None and previous.key != record.key:
+            self.remove_oid(record.oid)
+        self.by_oid[record.oid] = record
+        self.by_key.setdefault(record.key, {})[record.oid] = record
+        if len(self.by_oid) > self.max_orders:
+            self.evict(len(self.by_oid) - self.max_orders)
+        return record
+
+    def remove_oid(self, oid):
+        record = self.by_oid.pop(oid, None)
+        if record is not None:
+            at_key = self.by_key[record.key]
+            del at_key[oid]
+            if not at_key:
+                del self.by_key[record.key]
+        return record
+
+    def replace_all(self, orders):
+        self.by_oid.clear()
+        self.by_key.clear()
+        for order in orders:
+            self.upsert(order)
+
+    def evict(self, count):
+        """Drop the count least recently updated orders"""
+        for record in sorted(self.by_oid.values(), key=lambda record: record.updated_at)[:count]:
+            self.remove_oid(record.oid)
+
+    def evict_stale(self, max_age):
+        """Drop orders not confirmed by an update or snapshot within max_age seconds"""
+        cutoff = time.monotonic() - max_age
+        stale = [oid for oid, record in self.by_oid.items() if record.updated_at < cutoff]
+        for oid in stale:
+            self.remove_oid(oid)
+        return len(stale)
+
+    def get(self, key, default=None):
+        at_key = self.by_key.get(key)
+        return next(iter(at_key.values())) if at_key else default
+
+    def get_by_oid(self, oid):
+        return self.by_oid.get(oid)
+
+    def at(self, key):
+        """All orders resting at key"""
+        return list(self.by_key.get(key, {}).values())
+
+    def duplicates(self):
+        """Orders resting at a key behind an older one"""
+        return [record for at_key in self.by_key.values() for record in list(at_key.values())[1:]]
+
+    def items(self):
+        return ((key, next(iter(at_key.values()))) for key, at_key in self.by_key.items())
+
+    def values(self):
+        return self.by_oid.values()
+
+    def __contains__(self, key):
+        return key in self.by_key
+
+    def __iter__(self):
+        return iter(self.by_key)
+
+    def __len__(self):
+        return len(self.by_oid)
+
+class PriceBuckets:
+    """Copy account orders merged into geometric price buckets per coin and side, read like an OrderStore
+
+    A bucket spans width_bps basis points and is keyed like an order at its passive edge (the low edge for buys,
+    the high one for sells), rounded to a valid price, so its follower order never fills at a worse price than
+    any of its leader orders and keeps its key while their sizes change. update() re-aggregates the one bucket
+    an order changed in, rebuild() all of them after the store was replaced.
+    """
+
+    def __init__(self, store, width_bps):
+        self.store = store  # the copy account OrderStore, the source of truth
+        self.log_width = math.log1p(width_bps / 10_000)
+        self.members = {}  # bucket key -> keys of the store's orders in the bucket
+        self.by_key = {}  # bucket key -> aggregated OrderRecord
+
+    def bucket_of(self, key):
+        coin, side, px = key
+        index = math.floor(math.log(px / PX_SCALE) / self.log_width)
+        edge = math.exp((index if side == 'B' else index + 1) * self.log_width)
+        # Perp prices have at most 5 significant figures
+        return (coin, side, to_ticks(round(float(f"{edge:.5g}"), metadata.tick_decimals(coin))))
+
+    def update(self, key):
+        """Re-aggregate the bucket of the store's order at key after it was upserted or removed, returns the bucket key"""
+        bucket = self.bucket_of(key)
+        members = self.members.setdefault(bucket, set())
+        if key in self.store:
+            members.add(key)
+        else:
+            members.discard(key)
+        self._aggregate(bucket)
+        return bucket
+
+    def rebuild(self):
+        self.members.clear()
+        self.by_key.clear()
+        for key in self.store:
+            self.members.setdefault(self.bucket_of(key), set()).add(key)
+        for bucket in list(self.members):
+            self._aggregate(bucket)
+
+    def _aggregate(self, bucket):
+        # Keys evicted from the store meanwhile have no orders left
+        records = [record for key in self.members[bucket] for record in self.store.at(key)]
+        if not records:
+            del self.members[bucket]
+            self.by_key.pop(bucket, None)
+            return
+        self.by_key[bucket] = merge(bucket, records)
+
+    def get(self, key, default=None):
+        return self.by_key.get(key, default)
+
+    def items(self):
+        return self.by_key.items()
+
+    def values(self):
+        return self.by_key.values()
+
+    def __contains__(self, key):
+        return key in self.by_key
+
+    def __iter__(self):
+        return iter(self.by_key)
+
+    def __len__(self):
+        return len(self.by_key)
+
+class OrderTotals:
+    """The orders of a store summed per key, read like an OrderStore, so one order follows all orders at a price"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, key, default=None):
+        records = self.store.at(key)
+        return merge(key, records) if records else default
+
+    def items(self):
+        return ((key, merge(key, list(at_key.values()))) for key, at_key in self.store.by_key.items())
+
+    def values(self):
+        return (record for _, record in self.items())
+
+    def __contains__(self, key):
+        return key in self.store
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def __len__(self):
+        return len(self.store.by_key)
@@ -2,13 +2,19 @@ import asyncio
 import os
 import datetime
 import math
-import requests
+import time
 import eth_account
 from eth_account.signers.local import LocalAccount
 from hyperliquid.info import Info
 from hyperliquid.exchange import Exchange
-from hyperliquid.utils import constants
 from dotenv import load_dotenv
+from exchange_client import AsyncExchange
+from info_client import API_URL, info_client
+from rate_limiter import rate_limiter
+from market_data import MidPriceCache
+from metadata import metadata
+import journal
+import metrics
 from logger_config import setup_logging
 import healthcheck
 
@@ -20,48 +26,60 @@ logger = setup_logging('position_bot')
 
 # Initialize Hyperliquid
 account: LocalAccount = eth_account.Account.from_key(os.getenv("PRIVATE_KEY_API"))
+# Exchange metadata from the disk cache, refreshed in the background and when a coin is unknown
+metadata.load()
 exchange = Exchange(
     account, 
-    constants.MAINNET_API_URL, 
+    API_URL, 
+    meta=metadata.meta,
     vault_address=os.getenv("VAULT_ADDRESS", "") or None, 
-    account_address=os.getenv("ACCOUNT_ADDRESS", "") or None
+    account_address=os.getenv("ACCOUNT_ADDRESS", "") or None,
+    spot_meta=metadata.spot_meta,
 )
-info = Info(constants.MAINNET_API_URL, skip_ws=True)
+metadata.attach(exchange.info)
+exchange_client = AsyncExchange(exchange)
 
-# Get exchange metadata
-meta = info.meta()
-
-# Create szDecimals map
-sz_decimals = {}
-for asset_info in meta["universe"]:
-    sz_decimals[asset_info["name"]] = asset_info["szDecimals"]
+# coin -> szDecimals, picks up new listings when metadata refreshes
+sz_decimals = metadata.sz_decimals
 
 # Global variables from environment
 ACCOUNT_TO_COPY = os.getenv("ACCOUNT_TO_COPY")
 TRADING_ADDRESS = os.getenv("TRADING_ADDRESS")
 LEVERAGE = float(os.getenv("LEVERAGE", "5"))
 SLEEP_INTERVAL = float(os.getenv("SLEEP_INTERVAL", "5"))
+POSITION_BOT_MODE = os.getenv("POSITION_BOT_MODE", "poll")  # "poll" every SLEEP_INTERVAL or "ws" on leader position changes
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", "60"))  # max seconds between cycles in ws mode
+MID_STREAM = os.getenv("MID_STREAM", "1") == "1"  # keep mid prices current from the allMids websocket
+STATE_TTL = float(os.getenv("STATE_TTL", "4"))  # seconds a clearinghouseState snapshot is reused within a cycle
 TRADE_LIMIT = 10  # min trade size $10
 MINI_ALLOC_OF_PF = 0  # mini allocation in percent
 
+# Last logged (szi, entry price) per coin of each summary title, only changes are logged
+_position_summaries = {}
+
 def print_position_summary(positions, title):
+    """Log the positions opened, changed and closed since the last summary of title"""
+    current = {coin: (pos["szi"], pos["entryPxTotal"]) for coin, pos in positions.items()}
+    previous = _position_summaries.get(title)
+    if current == previous:
+        return
+    _position_summaries[title] = current
     if not positions:
         logger.info(f"\n{title}: No open positions")
         return
-        
-    logger.info(f"\n{title}:")
-    total_value = 0
-    
+    previous = previous or {}
+
+    lines = [f"  {coin}: Closed" for coin in previous.keys() - current.keys()]
     for coin, pos in positions.items():
+        if previous.get(coin) == current[coin]:
+            continue
         direction = "Long" if pos["szi"] > 0 else "Short"
-        size = abs(pos["szi"])
-        entry_price = pos["entryPxTotal"]
-        value = abs(pos["positionValue"])
-        total_value += value
-        
-        logger.info(f"  {coin}: {direction} {size:.4f} @ ${entry_price:.2f} ({value:.2f}%)")
-    
-    logger.info(f"\nTotal Position Value: {total_value:.2f}%")
+        lines.append(f"  {coin}: {direction} {abs(pos['szi']):.4f} @ ${pos['entryPxTotal']:.2f} ({abs(pos['positionValue']):.2f}%)")
+    total_value = sum(abs(pos["positionValue"]) for pos in positions.values())
+    logger.info(f"\n{title}:\n" + "\n".join(lines) + f"\nTotal Position Value: {total_value:.2f}%")
+
+def record_orders(action, outcome, count=1):
+    metrics.ORDERS.inc(count, bot="position_bot", action=action, outcome=outcome)
 
 class TradingBot:
     def __init__(self, trading_address, account_to_copy, path_file):
@@ -69,27 +87,32 @@ class TradingBot:
         self.account_to_copy = account_to_copy
         self.path_file = path_file
         self.previous_positions = {}
+        self.state_snapshots = {}  # address -> (fetched_at, clearinghouseState)
+        self.cycle_timings = {}  # wall-clock timings of the last process_positions cycle
+        # Websocket mode state
+        self.ws_info = None
+        self.leader_positions = None  # coin -> szi from the leader's last streamed state
+        self.position_changed = asyncio.Event()
+        self.change_detected_at = None  # monotonic time the first unhandled leader change was received
+        self.cycle_trigger_at = None  # what the current cycle's trades are copying, for the copy latency metric
+        self.mid_cache = MidPriceCache(self.get_perpetuals_price)
+        self.loop = asyncio.get_running_loop()
         logger.info(f"Initialized TradingBot with trading_address={trading_address}, account_to_copy={account_to_copy}")
 
+    async def get_clearinghouse_state(self, address):
+        """Fetch clearinghouseState at most once per STATE_TTL, so all reads within a cycle see the same snapshot"""
+        snapshot = self.state_snapshots.get(address)
+        if snapshot and time.monotonic() - snapshot[0] < STATE_TTL:
+            return snapshot[1]
+        data = await info_client.call("clearinghouse_state", address)
+        if not data or "crossMarginSummary" not in data:
+            raise ValueError("Invalid response format")
+        self.state_snapshots[address] = (time.monotonic(), data)
+        return data
+
     async def get_position(self, account):
         try:
-            url = 'https://api.hyperliquid.xyz/info'
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': '*/*',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Content-Type': 'application/json',
-                'Origin': 'https://app.hyperliquid.xyz',
-                'Referer': 'https://app.hyperliquid.xyz/',
-            }
-            
-            response = requests.post(url, json={"type": "clearinghouseState", "user": account}, headers=headers)
-            response.raise_for_status()
-            
-            data = response.json()
-            if not data:
-                raise ValueError("Empty response received")
+            data = await self.get_clearinghouse_state(account)
                 
             position_data = {
                 "address": account,
@@ -140,31 +163,24 @@ class TradingBot:
 
     async def get_perpetuals_price(self):
         try:
-            response = requests.post(
-                'https://api.hyperliquid.xyz/info',
-                json={"type": "allMids"},
-                headers={
-                    'User-Agent': 'Mozilla/5.0',
-                    'Content-Type': 'application/json',
-                    'Origin': 'https://app.hyperliquid.xyz',
-                }
-            )
-            response.raise_for_status()
-            return response.json()
+            return await info_client.call("all_mids")
         except Exception as e:
             logger.exception(f"Error in get_perpetuals_price")
             raise
 
     async def cancel_all_orders_on_market(self, market):
         try:
-            open_orders = info.open_orders(TRADING_ADDRESS)
+            open_orders = await info_client.call("open_orders", TRADING_ADDRESS)
                 
             for order in open_orders:
                 if order.get("coin") == market:
                     oid = order.get("oid")
-                    cancel_result = exchange.cancel(market, oid)
+                    cancel_result = await exchange_client.call("cancel", market, oid)
                     if cancel_result["status"] != "ok":
                         logger.error(f"Failed to cancel order {oid} for {market}: {cancel_result}")
+                        record_orders("cancel", "rejected")
+                    else:
+                        record_orders("cancel", "cancelled")
         except Exception as e:
             logger.exception(f"Error in cancel_all_orders_on_market for {market}")
             raise
@@ -172,20 +188,31 @@ class TradingBot:
     async def execute_trade(self, market, order_type, position_type, size):
         try:
             # Cancel all open orders for this market to avoid conflicts with order_bot if running as well
-            await self.cancel_all_orders_on_market(market)
+            _, market_price, unknown = await asyncio.gather(
+                self.cancel_all_orders_on_market(market),
+                self.mid_cache.get(market),
+                metadata.ensure(market),
+            )
+            if unknown:
+                logger.warning(f"Skipping trade of {market}, missing from the exchange metadata")
+                return False, f"Unknown coin {market}"
                 
             size = round(float(size), sz_decimals[market])
-            market_price = float((await self.get_perpetuals_price())[market])
 
             if size * market_price < TRADE_LIMIT:
                 logger.info(f"Trade size {size} {market} is below minimum trade limit ${TRADE_LIMIT}")
+                record_orders("trade", "skipped_too_small")
                 return False, f"Trade size {size} {market} is below minimum trade limit ${TRADE_LIMIT}"
 
             is_buy = order_type == "buy"
             
             logger.info(f"Executing {order_type} trade for {size} {market} at market price ${market_price}")
             
-            order_result = exchange.market_open(market, is_buy, size, market_price, 0.01)
+            order_result = await exchange_client.call("market_open", market, is_buy, size, market_price, 0.01)
+            if self.cycle_trigger_at is not None:
+                latency = time.monotonic() - self.cycle_trigger_at
+                metrics.COPY_LATENCY.observe(latency, bot="position_bot", action="trade")
+                healthcheck.record_copy_lag(latency)
             
             if order_result["status"] == "ok":
                 for status in order_result["response"]["data"]["statuses"]:
@@ -193,38 +220,111 @@ class TradingBot:
                         filled = status["filled"]
                         trade_msg = f"{'Buy' if is_buy else 'Sell'} {filled['totalSz']} {market} @ ${float(filled['avgPx']):.2f}"
                         logger.info(f"Trade executed successfully: {trade_msg}")
+                        record_orders("trade", "filled")
                         return True, trade_msg
                     else:
                         error_msg = f"Trade Error: {status.get('error', 'Unknown error')}"
                         logger.error(error_msg)
+                        record_orders("trade", "rejected")
                         return False, error_msg
             logger.error(f"Order failed: {order_result}")
+            record_orders("trade", "rejected")
             return False, "Order failed"
         except Exception as e:
             error_msg = f"Error executing trade: {str(e)}"
             logger.exception(error_msg)
             return False, error_msg
 
+    def start_streams(self):
+        """Subscribe to mid prices and, in ws mode, to the leader's fills and user state which trigger cycles"""
+        if self.ws_info is not None:
+            return
+        logger.info("Setting up WebSocket subscriptions...")
+        self.ws_info = Info(API_URL, skip_ws=False, meta=metadata.meta, spot_meta=metadata.spot_meta)
+        healthcheck.watch_feed(self.ws_info, "feed")
+        if MID_STREAM:
+            self.ws_info.subscribe({"type": "allMids"}, journal.recorded("allMids", self.mid_cache.handle_all_mids))
+        if POSITION_BOT_MODE == "ws":
+            self.ws_info.subscribe({"type": "userFills", "user": self.account_to_copy}, journal.recorded("userFills", self.handle_leader_fills))
+            self.ws_info.subscribe({"type": "webData2", "user": self.account_to_copy}, journal.recorded("webData2", self.handle_leader_state))
+
+    def handle_leader_fills(self, msg):
+        """Handle fills of the account we're copying (called from the websocket thread)"""
+        data = msg.get("data", {})
+        if data.get("isSnapshot") or not data.get("fills"):
+            return
+        for fill in data["fills"]:
+            metrics.WS_RECEIVE_LAG.observe(max(time.time() - fill["time"] / 1000, 0), feed="userFills", account="copy")
+        self.loop.call_soon_threadsafe(self.signal_position_change)
+
+    def handle_leader_state(self, msg):
+        """Handle user state of the account we're copying (called from the websocket thread)"""
+        try:
+            state = msg.get("data", {}).get("clearinghouseState")
+            if not state:
+                return
+            positions = {pos["position"]["coin"]: pos["position"]["szi"] for pos in state["assetPositions"]}
+            if positions != self.leader_positions:
+                if self.leader_positions is not None:
+                    self.loop.call_soon_threadsafe(self.signal_position_change)
+                self.leader_positions = positions
+        except Exception:
+            logger.exception("Error in handle_leader_state")
+
+    def signal_position_change(self):
+        if self.change_detected_at is None:
+            self.change_detected_at = time.monotonic()
+        self.position_changed.set()
+
+    async def wait_for_next_cycle(self):
+        if POSITION_BOT_MODE != "ws":
+            await asyncio.sleep(SLEEP_INTERVAL)
+            return
+        try:
+            await asyncio.wait_for(self.position_changed.wait(), RECONCILE_INTERVAL)
+            logger.info("Leader position changed")
+        except asyncio.TimeoutError:
+            logger.info("No leader position change, reconciling")
+        self.position_changed.clear()
+
     async def process_positions(self):
         try:
+            if POSITION_BOT_MODE == "ws" or MID_STREAM:
+                self.start_streams()
+            cycle_interval = RECONCILE_INTERVAL if POSITION_BOT_MODE == "ws" else SLEEP_INTERVAL
+            healthcheck.watch("sync", max(healthcheck.SYNC_STALE_SECONDS, 3 * cycle_interval), liveness=True)
             while True:
                 current_time = datetime.datetime.now().strftime("%H:%M:%S")
+                cycle_start = time.perf_counter()
+                # Trades copy the leader change that woke this cycle, in poll mode the change is seen at cycle start
+                self.cycle_trigger_at = self.change_detected_at or time.monotonic()
+                self.change_detected_at = None
+                # Fetch each account's state once per cycle
+                self.state_snapshots.clear()
                 
-                # Get account values
-                copy_account_value = float(await self.get_balance(self.account_to_copy))
-                my_account_value = float(await self.get_balance(self.trading_address)) * LEVERAGE
+                # Get account values concurrently
+                copy_balance, my_balance = await asyncio.gather(
+                    self.get_balance(self.account_to_copy),
+                    self.get_balance(self.trading_address),
+                )
+                copy_account_value = float(copy_balance)
+                my_account_value = float(my_balance) * LEVERAGE
+                fetched = time.perf_counter()
                 
                 logger.info(f"\n=== Position Update {current_time} ===")
                 logger.info(f"Master Account: ${copy_account_value:,.2f}")
                 logger.info(f"Copy Account: ${my_account_value:,.2f} (with {LEVERAGE}x leverage)")
-                
-                # Get current market prices
-                prices = await self.get_perpetuals_price()
+                logger.debug(f"Info connection stats: {info_client.connection_stats()}")
+                logger.debug(f"Rate limit budget: {rate_limiter.usage()}")
                 pending_actions = []
                 
-                # Get and display positions
-                my_positions = await self.get_allocations(self.trading_address)
-                copy_positions = await self.get_allocations(self.account_to_copy)
+                # Get and display positions, served from this cycle's snapshots
+                my_positions, copy_positions = await asyncio.gather(
+                    self.get_allocations(self.trading_address),
+                    self.get_allocations(self.account_to_copy),
+                )
+                # Current market prices from the mid stream, over REST only if stale
+                prices = await self.mid_cache.get_prices(copy_positions.keys() | my_positions.keys())
                 
                 print_position_summary(copy_positions, "Master Account Positions")
                 print_position_summary(my_positions, "Copy Account Positions")
@@ -256,8 +356,18 @@ class TradingBot:
                     logger.info("\nPosition Updates:")
                     for action in pending_actions:
                         logger.info(f"• {action}")
+
+                cycle_end = time.perf_counter()
+                self.cycle_timings = {
+                    "fetch_ms": (fetched - cycle_start) * 1000,
+                    "trade_ms": (cycle_end - fetched) * 1000,
+                    "total_ms": (cycle_end - cycle_start) * 1000,
+                }
+                metrics.CYCLE_SECONDS.observe(cycle_end - cycle_start, bot="position_bot")
+                healthcheck.heartbeat("sync")
+                logger.info(f"Cycle timings: fetch {self.cycle_timings['fetch_ms']:.0f}ms, trades {self.cycle_timings['trade_ms']:.0f}ms, total {self.cycle_timings['total_ms']:.0f}ms")
                 
-                await asyncio.sleep(SLEEP_INTERVAL)
+                await self.wait_for_next_cycle()
 
         except KeyboardInterrupt:
             logger.info("\nShutting down...")
@@ -345,19 +455,7 @@ class TradingBot:
 
     async def get_balance(self, address):
         try:
-            response = requests.post(
-                'https://api.hyperliquid.xyz/info',
-                json={"type": "clearinghouseState", "user": address},
-                headers={
-                    'User-Agent': 'Mozilla/5.0',
-                    'Content-Type': 'application/json',
-                    'Origin': 'https://app.hyperliquid.xyz',
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            if not data or "crossMarginSummary" not in data:
-                raise ValueError("Invalid response format")
+            data = await self.get_clearinghouse_state(address)
             return data["crossMarginSummary"]["accountValue"]
         except Exception as e:
             logger.exception(f"Error in get_balance")
@@ -365,8 +463,13 @@ class TradingBot:
 
 async def main():
     # Initialize and start the trading bot
+    journal.start("position_bot", {"account_to_copy": ACCOUNT_TO_COPY, "trading_address": TRADING_ADDRESS})
+    journal.record("meta", metadata.meta)
     bot = TradingBot(TRADING_ADDRESS, ACCOUNT_TO_COPY, "")
-    await bot.process_positions()
+    try:
+        await bot.process_positions()
+    finally:
+        journal.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
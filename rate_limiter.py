@@ -0,0 +1,131 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+import metrics
+
+# Priority classes, lower is served first: cancels take risk off, placements add it, info reads can wait
+CANCEL, PLACE, INFO = 0, 1, 2
+PRIORITY_NAMES = {CANCEL: "cancel", PLACE: "place", INFO: "info"}
+
+# Info requests of these types weigh 2, all others 20
+LIGHT_INFO_TYPES = {"l2Book", "allMids", "clearinghouseState", "orderStatus", "spotClearinghouseState", "exchangeStatus"}
+# Exchange methods scheduled at cancel priority
+CANCEL_METHODS = {"cancel", "bulk_cancel", "cancel_by_cloid", "bulk_cancel_by_cloid", "schedule_cancel"}
+
+def info_weight(request_type):
+    return 2 if request_type in LIGHT_INFO_TYPES else 20
+
+def exchange_weight(batch_length):
+    """An exchange action weighs 1 + floor(batch length / 40)"""
+    return 1 + batch_length // 40
+
+class RateLimited(Exception):
+    """An info request was shed because the budget would not cover it within RATE_LIMIT_MAX_INFO_WAIT"""
+
+class RateLimiter:
+    """Token bucket of the per-IP request weight budget shared by info requests and exchange actions
+
+    Requests that do not fit the bucket queue by priority, a queued cancel is served before any queued
+    placement, and both before info reads. Info reads may not draw the bucket below the reserve kept
+    for orders, and are shed with RateLimited when they would wait longer than max_info_wait.
+    Runs on the event loop thread.
+    """
+
+    def __init__(self, weight_per_minute=None, burst=None, info_reserve=None, max_info_wait=None):
+        self.weight_per_minute = weight_per_minute or float(os.getenv("RATE_LIMIT_WEIGHT_PER_MINUTE", "1200"))
+        self.burst = burst or float(os.getenv("RATE_LIMIT_BURST", "200"))
+        # Any 60s window spends at most the burst plus a minute of refill, which has to stay within the limit
+        self.rate = (self.weight_per_minute - self.burst) / 60
+        self.info_reserve = info_reserve if info_reserve is not None else float(os.getenv("RATE_LIMIT_INFO_RESERVE", "50"))
+        self.max_info_wait = max_info_wait if max_info_wait is not None else float(os.getenv("RATE_LIMIT_MAX_INFO_WAIT", "5"))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.waiters = []  # heap of (priority, sequence, weight, future)
+        self.sequence = itertools.count()
+        self.wakeup = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _floor(self, priority):
+        return self.info_reserve if priority == INFO else 0
+
+    def _fits(self, weight, priority):
+        # A request heavier than the burst is let through on a full bucket and leaves it in debt
+        return self.tokens - min(weight, self.burst) >= self._floor(priority)
+
+    def _take(self, weight, priority):
+        self.tokens -= weight
+        WEIGHT_SPENT.inc(weight, priority=PRIORITY_NAMES[priority])
+
+    async def acquire(self, weight, priority):
+        """Wait until the budget covers a request of weight, raises RateLimited when an info read is shed"""
+        self._refill()
+        if (not self.waiters or self.waiters[0][0] > priority) and self._fits(weight, priority):
+            self._take(weight, priority)
+            return
+        if priority == INFO:
+            queued = sum(w for p, _, w, future in self.waiters if p <= priority and not future.done())
+            wait = (queued + min(weight, self.burst) + self._floor(priority) - self.tokens) / self.rate
+            if wait > self.max_info_wait:
+                WAITS.inc(priority=PRIORITY_NAMES[priority], outcome="shed")
+                raise RateLimited(f"Info request of weight {weight} would wait {wait:.1f}s for rate limit budget")
+        WAITS.inc(priority=PRIORITY_NAMES[priority], outcome="queued")
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), weight, future))
+        self._schedule()
+        await future
+
+    def _dispatch(self):
+        self.wakeup = None
+        self._refill()
+        while self.waiters:
+            priority, _, weight, future = self.waiters[0]
+            if future.done():  # the waiting task was cancelled
+                heapq.heappop(self.waiters)
+                continue
+            if not self._fits(weight, priority):
+                break
+            heapq.heappop(self.waiters)
+            self._take(weight, priority)
+            future.set_result(None)
+        self._schedule()
+
+    def _schedule(self):
+        """Wake up when the bucket has refilled enough for the first waiter"""
+        if self.wakeup is not None:
+            self.wakeup.cancel()
+            self.wakeup = None
+        if self.waiters:
+            priority, _, weight, _ = self.waiters[0]
+            missing = min(weight, self.burst) + self._floor(priority) - self.tokens
+            self.wakeup = asyncio.get_running_loop().call_later(max(missing / self.rate, 0), self._dispatch)
+
+    def usage(self):
+        """Current budget: available and burst weight, and queued requests and weight per priority
+
+        Read only, so it is safe to call from the healthcheck thread.
+        """
+        available = min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.rate)
+        stats = {"available": round(available, 1), "burst": self.burst, "weight_per_minute": self.weight_per_minute}
+        waiters = list(self.waiters)
+        for priority, name in PRIORITY_NAMES.items():
+            waiting = [w for p, _, w, future in waiters if p == priority and not future.done()]
+            stats[f"{name}_queued"] = len(waiting)
+            stats[f"{name}_queued_weight"] = sum(waiting)
+        return stats
+
+WEIGHT_SPENT = metrics.Counter("copytrader_rate_limit_weight_total", "Request weight spent per priority")
+WAITS = metrics.Counter("copytrader_rate_limit_waits_total", "Requests queued for or shed by the rate limit, per priority")
+
+# Shared by the info client and the exchange client, so both draw from one budget per process
+rate_limiter = RateLimiter()
+metrics.Gauge(
+    "copytrader_rate_limit",
+    "Rate limit budget: available and burst weight, and queued requests and weight per priority",
+    lambda: {(("stat", stat),): value for stat, value in rate_limiter.usage().items()},
+)
@@ -0,0 +1,179 @@
+"""Replay a journal recorded with JOURNAL_DIR set into a bot
+
+Websocket messages are handed to the bot's handlers at the recorded pace sped up --speed times, or
+as fast as the bot takes them with --speed 0, and info requests are answered with the latest
+response recorded up to that point of the journal. Exchange actions still go to HYPERLIQUID_API_URL,
+which has to point at benchmarks/mock_server.py. Our own order updates are replayed as recorded,
+so cancels and modifies of the recorded oids are rejected by the mock, the replay reproduces the
+load and the bot's decisions rather than the exact exchange state.
+
+Usage: HYPERLIQUID_API_URL=http://127.0.0.1:8900 python replay.py JOURNAL [--bot order_bot] [--speed 0]
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import sys
+import threading
+import time
+import requests
+from hyperliquid.utils import constants
+import journal
+import metrics
+from info_client import API_URL, info_client
+from metadata import metadata
+from rate_limiter import rate_limiter
+
+class RecordedInfo:
+    """Info responses as of the replay clock, keyed by request
+
+    post() runs on the info client's threads, a request the replay has not reached a response to yet
+    waits for it, up to wait seconds or until the journal ends.
+    """
+
+    def __init__(self, wait=10):
+        self.wait = wait
+        self.responses = {}
+        self.finished = False
+        self.condition = threading.Condition()
+
+    @staticmethod
+    def key(request):
+        return json.dumps(request, sort_keys=True)
+
+    def update(self, message):
+        with self.condition:
+            self.responses[self.key(message["request"])] = message["response"]
+            self.condition.notify_all()
+
+    def finish(self):
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def post(self, payload, timeout=None):
+        key = self.key(payload)
+        with self.condition:
+            self.condition.wait_for(lambda: key in self.responses or self.finished, self.wait)
+            if key not in self.responses:
+                raise LookupError(f"No recorded response to {payload}")
+            return self.responses[key]
+
+def read_head(records, recorded_info):
+    """Consume the records up to the first websocket message, returning the bot context, meta and that message"""
+    context, meta = {}, None
+    for record in records:
+        _, channel, message = record
+        if channel == "start":
+            context = message
+        elif channel == "meta":
+            meta = message
+        elif channel == "info":
+            recorded_info.update(message)
+        else:
+            return context, meta, [record]
+    return context, meta, []
+
+async def feed(records, handlers, recorded_info, speed):
+    """Hand websocket messages to their handlers on the recorded schedule, returns (messages, recorded span in s)"""
+    first_ns = last_ns = None
+    start = time.monotonic()
+    messages = 0
+    for monotonic_ns, channel, message in records:
+        first_ns = first_ns if first_ns is not None else monotonic_ns
+        last_ns = monotonic_ns
+        if speed > 0:
+            delay = (monotonic_ns - first_ns) / 1e9 / speed - (time.monotonic() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if channel == "info":
+            recorded_info.update(message)
+        elif channel in handlers:
+            handlers[channel](message)
+            messages += 1
+        if speed <= 0:
+            await asyncio.sleep(0)  # let the bot's workers keep up
+    recorded_info.finish()
+    return messages, (last_ns - first_ns) / 1e9 if first_ns is not None else 0.0
+
+async def replay_order_bot(context, records, recorded_info, speed):
+    order_bot = importlib.import_module("order_bot")
+    bot = order_bot.OrderBot()
+    bot.ACCOUNT_TO_COPY = context.get("account_to_copy", bot.ACCOUNT_TO_COPY)
+    bot.TRADING_ADDRESS = context.get("trading_address", bot.TRADING_ADDRESS)
+    try:
+        await bot.snapshot_sync(initial=True)
+        result = await feed(records, {
+            "orderUpdates:copy": bot.handle_copy_account_order_update,
+            "orderUpdates:my": bot.handle_my_order_update,
+            "webData2": bot.handle_account_state,
+        }, recorded_info, speed)
+        while not (bot.copy_workers.idle() and bot.my_workers.idle()):
+            await asyncio.sleep(0.01)
+        return result
+    finally:
+        bot.copy_workers.stop()
+        bot.my_workers.stop()
+        bot.info.disconnect_websocket()
+        bot.info2.disconnect_websocket()
+        bot.exchange_client.shutdown()
+
+async def replay_position_bot(context, records, recorded_info, speed):
+    position_bot = importlib.import_module("position_bot")
+    position_bot.POSITION_BOT_MODE = "ws"  # cycles are triggered by the replayed messages
+    position_bot.TRADING_ADDRESS = context.get("trading_address", position_bot.TRADING_ADDRESS)
+    bot = position_bot.TradingBot(position_bot.TRADING_ADDRESS, context.get("account_to_copy", position_bot.ACCOUNT_TO_COPY), "")
+    bot.ws_info = recorded_info  # streams come from the journal, keeps start_streams from subscribing
+    cycles = asyncio.create_task(bot.process_positions())
+    try:
+        result = await feed(records, {
+            "allMids": bot.mid_cache.handle_all_mids,
+            "userFills": bot.handle_leader_fills,
+            "webData2": bot.handle_leader_state,
+        }, recorded_info, speed)
+        # Let the cycle triggered by the last messages run
+        await asyncio.sleep(0)
+        deadline = time.monotonic() + position_bot.RECONCILE_INTERVAL
+        while bot.position_changed.is_set() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        return result
+    finally:
+        cycles.cancel()
+        position_bot.exchange_client.shutdown()
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("journal", help="journal segment or directory of segments")
+    parser.add_argument("--bot", choices=["order_bot", "position_bot"], default="order_bot")
+    parser.add_argument("--speed", type=float, default=0, help="replay speed-up over the recorded pace, 0 for as fast as possible")
+    args = parser.parse_args()
+    if API_URL in (constants.MAINNET_API_URL, constants.TESTNET_API_URL):
+        sys.exit("Set HYPERLIQUID_API_URL to a benchmarks/mock_server.py instance, replayed orders would be sent to the real exchange")
+
+    # The mock does not limit requests, the live budget would pace the replay instead of the bot
+    rate_limiter.weight_per_minute = rate_limiter.burst = rate_limiter.tokens = 1e9
+    rate_limiter.rate = rate_limiter.weight_per_minute / 60
+
+    recorded_info = RecordedInfo()
+    records = journal.read(args.journal, args.bot)
+    context, meta, head = read_head(records, recorded_info)
+    if meta is not None:
+        # The bot resolves coins against the served universe, it has to match the recorded one
+        requests.post(f"{API_URL}/control/meta", json=meta).raise_for_status()
+    # Download the served universe now, a cached one from an earlier run could differ
+    metadata.refresh().result()
+    info_client.post = recorded_info.post
+
+    replay_bot = replay_order_bot if args.bot == "order_bot" else replay_position_bot
+    start = time.monotonic()
+    messages, span = await replay_bot(context, itertools.chain(head, records), recorded_info, args.speed)
+    elapsed = time.monotonic() - start
+
+    print(f"Replayed {messages} messages spanning {span:.1f}s in {elapsed:.2f}s ({messages / elapsed:.0f} msg/s, {span / elapsed:.1f}x)")
+    for labels, count in sorted(metrics.ORDERS.values.items()):
+        labels = dict(labels)
+        print(f"  {labels['action']} {labels['outcome']}: {count}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
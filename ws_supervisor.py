@@ -0,0 +1,125 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from hyperliquid.websocket_manager import WebsocketManager
+import healthcheck
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class WebsocketSupervisor:
+    """Keeps the websocket of an Info connected and its subscriptions active
+
+    Pings every ping_interval seconds and treats the connection as lost when its thread has exited or
+    nothing, pongs included, arrived for stale_after seconds. A lost connection is replaced with a new
+    one, retried with jittered exponential backoff, the subscriptions made through subscribe() are
+    renewed on it and on_reconnect(name) is awaited to recover the updates missed in between.
+    """
+
+    def __init__(self, info, base_url, name, on_reconnect, ping_interval=None, stale_after=None, max_backoff=None):
+        self.info = info
+        self.base_url = base_url
+        self.name = name
+        self.on_reconnect = on_reconnect
+        self.ping_interval = ping_interval or float(os.getenv("WS_PING_INTERVAL", "10"))
+        self.stale_after = stale_after or float(os.getenv("WS_STALE_SECONDS", "30"))
+        self.max_backoff = max_backoff or float(os.getenv("WS_MAX_BACKOFF", "30"))
+        self.connect_timeout = 10
+        self.subscriptions = []  # (subscription, callback) renewed on every new connection
+        self.last_message = time.monotonic()
+        healthcheck.watch(f"feed:{name}", healthcheck.FEED_STALE_SECONDS)
+        self._watch(info.ws_manager)
+
+    def _watch(self, ws_manager):
+        """Note the time of every message the connection receives, before the SDK dispatches it"""
+        ws = ws_manager.ws
+        on_message = ws.on_message
+
+        def beat(ws_app, message):
+            self.last_message = time.monotonic()
+            healthcheck.heartbeat(f"feed:{self.name}")
+            on_message(ws_app, message)
+        ws.on_message = beat
+
+    def subscribe(self, subscription, callback):
+        self.subscriptions.append((subscription, callback))
+        return self.info.subscribe(subscription, callback)
+
+    def connected(self):
+        ws_manager = self.info.ws_manager
+        return (
+            ws_manager.is_alive() and ws_manager.ws.keep_running
+            and time.monotonic() - self.last_message < self.stale_after
+        )
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            if not self.connected():
+                await self.reconnect()
+                continue
+            try:
+                self.info.ws_manager.ws.send(json.dumps({"method": "ping"}))
+            except Exception as e:
+                logger.warning(f"Failed to ping {self.name} websocket: {e}")
+
+    async def reconnect(self):
+        detected = time.monotonic()
+        logger.warning(f"{self.name} websocket lost, silent for {detected - self.last_message:.1f}s, reconnecting")
+        metrics.WS_DISCONNECTS.inc(feed=self.name)
+        # Stopping closes the socket and joins the SDK's ping thread, keep it off the event loop
+        await asyncio.to_thread(self.info.ws_manager.stop)
+
+        attempt = 0
+        while True:
+            ws_manager = WebsocketManager(self.base_url)
+            self._watch(ws_manager)
+            for subscription, callback in self.subscriptions:
+                ws_manager.subscribe(subscription, callback)  # sent once the connection opens
+            ws_manager.start()
+            if await self.wait_ready(ws_manager):
+                break
+            await asyncio.to_thread(ws_manager.stop)
+            attempt += 1
+            delay = random.uniform(0, min(self.max_backoff, 2 ** attempt))
+            logger.warning(f"{self.name} websocket reconnect attempt {attempt} failed, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        self.info.ws_manager = ws_manager
+        self.last_message = time.monotonic()
+        logger.info(f"{self.name} websocket reconnected after {time.monotonic() - detected:.1f}s, resyncing")
+        try:
+            await self.on_reconnect(self.name)
+        except Exception:
+            logger.exception(f"Error recovering {self.name} websocket updates")
+        metrics.WS_RECOVERY_SECONDS.observe(time.monotonic() - detected, feed=self.name)
+
+    async def close(self):
+        """Close the websocket and wait for its thread to exit
+
+        The SDK's stop() reads the server's close frame itself, leaving the reader thread in its 10s select
+        and delaying the process exit. Here the reader thread receives the close frame and exits at once.
+        """
+        ws_manager = self.info.ws_manager
+        ws_manager.stop_event.set()
+        ws = ws_manager.ws
+        ws.keep_running = False
+        try:
+            if ws.sock is not None and ws.sock.connected:
+                ws.sock.send_close()
+        except Exception as e:
+            logger.warning(f"Failed to close {self.name} websocket: {e}")
+        await asyncio.to_thread(ws_manager.join, 1)
+
+    async def wait_ready(self, ws_manager):
+        deadline = time.monotonic() + self.connect_timeout
+        while time.monotonic() < deadline:
+            if ws_manager.ws_ready:
+                return True
+            if not ws_manager.is_alive():
+                return False
+            await asyncio.sleep(0.05)
+        return False